@@ -0,0 +1,39 @@
+# backend/addresses.py
+import re
+from typing import Optional
+
+NON_ALNUM = re.compile(r"[^a-z0-9]+")
+# Common spellings of the same address token. Geocode cache keys, walk-list
+# stops and voter match keys are all built with this one table.
+ABBREVIATIONS = {
+    "street": "st",
+    "avenue": "ave",
+    "av": "ave",
+    "boulevard": "blvd",
+    "drive": "dr",
+    "road": "rd",
+    "lane": "ln",
+    "court": "ct",
+    "place": "pl",
+    "terrace": "ter",
+    "highway": "hwy",
+    "parkway": "pkwy",
+    "circle": "cir",
+    "north": "n",
+    "south": "s",
+    "east": "e",
+    "west": "w",
+    "northeast": "ne",
+    "northwest": "nw",
+    "southeast": "se",
+    "southwest": "sw",
+    "apartment": "apt",
+    "unit": "apt",
+    "suite": "ste",
+    "minnesota": "mn",
+}
+
+
+def normalize_address(address: Optional[str]) -> str:
+    """Reduce an address to a key so case, punctuation and abbreviation differences compare equal."""
+    return " ".join(ABBREVIATIONS.get(token, token) for token in NON_ALNUM.sub(" ", (address or "").lower()).split())
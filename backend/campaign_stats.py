@@ -0,0 +1,186 @@
+# backend/campaign_stats.py
+import datetime
+from collections import Counter
+from typing import Dict, Optional
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from config import CAMPAIGN_STATS_RECONCILE_SECONDS
+from database import dialect_insert
+from live_stats import stats_broadcaster
+from models import CampaignStatCounter, PhoneBankingCampaign, PhoneContact
+
+STATUS = "status"
+SUPPORT = "support"
+VOLUNTEER = "volunteer"
+# Session.info keys holding deltas written, and campaigns invalidated, in the current transaction; published once it commits
+PENDING_DELTAS = "campaign_stat_deltas"
+PENDING_RESYNCS = "campaign_stat_resyncs"
+
+
+def _status_key(status: Optional[str]) -> str:
+    return status or "pending"
+
+
+def _is_called(status: Optional[str]) -> bool:
+    return _status_key(status) != "pending"
+
+
+def outcome_deltas(
+    deltas: Counter,
+    campaign_id: int,
+    volunteer_id: Optional[int],
+    old_status: Optional[str],
+    old_support: Optional[int],
+    new_status: Optional[str],
+    new_support: Optional[int],
+) -> Counter:
+    """Accumulate into `deltas` the counter changes for one contact moving from its old to its new values."""
+    if _status_key(old_status) != _status_key(new_status):
+        deltas[(campaign_id, STATUS, _status_key(old_status))] -= 1
+        deltas[(campaign_id, STATUS, _status_key(new_status))] += 1
+    if old_support != new_support:
+        if old_support is not None:
+            deltas[(campaign_id, SUPPORT, str(old_support))] -= 1
+        if new_support is not None:
+            deltas[(campaign_id, SUPPORT, str(new_support))] += 1
+    if volunteer_id is not None and _is_called(old_status) != _is_called(new_status):
+        deltas[(campaign_id, VOLUNTEER, str(volunteer_id))] += 1 if _is_called(new_status) else -1
+    return deltas
+
+
+def apply_stat_deltas(db: Session, deltas: Counter):
+    """
+    Add the deltas to the counters with one atomic upsert. The campaigns are
+    share-locked first: writers do not wait for each other, but cannot
+    interleave with a rebuild in reconcile_campaign_stats. The caller commits.
+    """
+    rows = [
+        {"campaign_id": campaign_id, "dimension": dimension, "key": key, "count": delta}
+        for (campaign_id, dimension, key), delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return
+    campaign_ids = sorted({row["campaign_id"] for row in rows})
+    db.query(PhoneBankingCampaign.id).filter(PhoneBankingCampaign.id.in_(campaign_ids)).order_by(
+        PhoneBankingCampaign.id
+    ).with_for_update(read=True).all()
+    statement = dialect_insert(db, CampaignStatCounter.__table__).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["campaign_id", "dimension", "key"],
+        set_={"count": CampaignStatCounter.__table__.c.count + statement.excluded.count}
+    )
+    db.execute(statement)
+    db.info.setdefault(PENDING_DELTAS, Counter()).update(deltas)
+
+
+def invalidate_campaign_stats(db: Session, campaign_id: int):
+    """
+    Mark a campaign's counters stale after contacts were added without going
+    through the counters (imports), so the next read rebuilds them and live
+    subscribers are told to refetch. The campaign row update also waits for a
+    rebuild in progress. The caller commits.
+    """
+    db.query(PhoneBankingCampaign).filter(PhoneBankingCampaign.id == campaign_id).update(
+        {PhoneBankingCampaign.stats_reconciled_at: None}, synchronize_session=False
+    )
+    db.info.setdefault(PENDING_RESYNCS, set()).add(campaign_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_deltas(session: Session):
+    # The data is already committed: a failure here must not reach the caller of commit(),
+    # who would report an error or retry writes that went through
+    deltas = session.info.pop(PENDING_DELTAS, None)
+    resyncs = session.info.pop(PENDING_RESYNCS, set())
+    if deltas:
+        try:
+            stats_broadcaster.publish(deltas)
+        except Exception as e:
+            print(f"Live stats deltas could not be published: {e}")
+            resyncs.update(campaign_id for campaign_id, _, _ in deltas)
+    for campaign_id in resyncs:
+        try:
+            stats_broadcaster.resync(campaign_id)
+        except Exception as e:
+            print(f"Live stats resync for campaign {campaign_id} failed: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back_deltas(session: Session):
+    session.info.pop(PENDING_DELTAS, None)
+    session.info.pop(PENDING_RESYNCS, None)
+
+
+def reconcile_campaign_stats(db: Session, campaign: PhoneBankingCampaign, max_age: Optional[float] = None) -> bool:
+    """
+    Rebuild a campaign's counters from phone_contacts, correcting any drift.
+    The campaign row is locked for the rebuild, so concurrent rebuilds run
+    one after the other and counter writers (apply_stat_deltas) wait rather
+    than have their deltas overwritten. With max_age, a campaign rebuilt less
+    than max_age seconds ago (e.g. by the request that held the lock first)
+    is left alone. Returns whether the counters were rebuilt. The caller commits.
+    """
+    reconciled_at = db.query(PhoneBankingCampaign.stats_reconciled_at).filter(
+        PhoneBankingCampaign.id == campaign.id
+    ).with_for_update().scalar()
+    if max_age is not None and reconciled_at is not None and (datetime.datetime.utcnow() - reconciled_at).total_seconds() <= max_age:
+        return False
+
+    contacts = db.query(PhoneContact).filter(PhoneContact.campaign_id == campaign.id)
+    counts = Counter()
+    for status, count in contacts.with_entities(PhoneContact.status, func.count(PhoneContact.id)).group_by(PhoneContact.status):
+        counts[(STATUS, _status_key(status))] += count
+    for level, count in contacts.with_entities(PhoneContact.support_level, func.count(PhoneContact.id)).filter(
+        PhoneContact.support_level.isnot(None)
+    ).group_by(PhoneContact.support_level):
+        counts[(SUPPORT, str(level))] += count
+    for volunteer_id, count in contacts.with_entities(PhoneContact.volunteer_id, func.count(PhoneContact.id)).filter(
+        PhoneContact.volunteer_id.isnot(None),
+        PhoneContact.status.isnot(None),
+        PhoneContact.status != "pending"
+    ).group_by(PhoneContact.volunteer_id):
+        counts[(VOLUNTEER, str(volunteer_id))] += count
+
+    db.query(CampaignStatCounter).filter(CampaignStatCounter.campaign_id == campaign.id).delete(synchronize_session=False)
+    if counts:
+        statement = dialect_insert(db, CampaignStatCounter.__table__).values([
+            {"campaign_id": campaign.id, "dimension": dimension, "key": key, "count": count}
+            for (dimension, key), count in counts.items()
+        ])
+        # An upsert, so a counter written by a path that skipped the campaign lock cannot fail the rebuild
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["campaign_id", "dimension", "key"],
+            set_={"count": statement.excluded.count}
+        ))
+    campaign.stats_reconciled_at = datetime.datetime.utcnow()
+    return True
+
+
+def get_campaign_stats(db: Session, campaign: PhoneBankingCampaign) -> Dict[str, dict]:
+    """
+    Status, support-level and per-volunteer call distributions read from the
+    counters table. The counters are rebuilt first when they have never been
+    built or are older than CAMPAIGN_STATS_RECONCILE_SECONDS.
+    """
+    reconciled_at = campaign.stats_reconciled_at
+    if reconciled_at is None or (datetime.datetime.utcnow() - reconciled_at).total_seconds() > CAMPAIGN_STATS_RECONCILE_SECONDS:
+        rebuilt = reconcile_campaign_stats(db, campaign, max_age=CAMPAIGN_STATS_RECONCILE_SECONDS)
+        db.commit()
+        if rebuilt:
+            stats_broadcaster.resync(campaign.id)
+
+    stats = {STATUS: {}, SUPPORT: {}, VOLUNTEER: {}}
+    rows = db.query(CampaignStatCounter.dimension, CampaignStatCounter.key, CampaignStatCounter.count).filter(
+        CampaignStatCounter.campaign_id == campaign.id,
+        CampaignStatCounter.count != 0
+    ).all()
+    for dimension, key, count in rows:
+        stats[dimension][key if dimension == STATUS else int(key)] = count
+    return {
+        "status_distribution": stats[STATUS],
+        "support_distribution": stats[SUPPORT],
+        "volunteer_stats": stats[VOLUNTEER],
+    }
@@ -1,5 +1,6 @@
 # backend/config.py
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()  # take environment variables from .env
@@ -10,4 +11,44 @@ DB_NAME = os.getenv("DB_NAME", "polistudio_db")
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "secret")
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
\ No newline at end of file
+DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Geocoding cache: how long a resolved (or unresolvable) address is trusted before it is looked up again
+GEOCODE_CACHE_TTL_DAYS = int(os.getenv("GEOCODE_CACHE_TTL_DAYS", "180"))
+GEOCODE_NEGATIVE_TTL_DAYS = int(os.getenv("GEOCODE_NEGATIVE_TTL_DAYS", "7"))
+
+# Geocoder backend ("nominatim" or "local" for the offline stand-in) and background pipeline tuning
+GEOCODER_BACKEND = os.getenv("GEOCODER_BACKEND", "nominatim")
+GEOCODE_RATE_LIMIT = float(os.getenv("GEOCODE_RATE_LIMIT", "1"))  # requests per second, 0 disables
+GEOCODE_CONCURRENCY = int(os.getenv("GEOCODE_CONCURRENCY", "4"))
+GEOCODE_BATCH_SIZE = int(os.getenv("GEOCODE_BATCH_SIZE", "100"))
+
+# Phone banking: how long a volunteer's claim on an uncalled contact lasts before others can take it
+PHONE_CLAIM_TTL_MINUTES = int(os.getenv("PHONE_CLAIM_TTL_MINUTES", "30"))
+# No-answer / call-back contacts are requeued only after this long since the last attempt
+PHONE_RETRY_AFTER_MINUTES = int(os.getenv("PHONE_RETRY_AFTER_MINUTES", "60"))
+# Dial queue: contacts leased per refill, and how often / how many buffered call outcomes are written back
+DIAL_PREFETCH_SIZE = int(os.getenv("DIAL_PREFETCH_SIZE", "200"))
+DIAL_FLUSH_SECONDS = float(os.getenv("DIAL_FLUSH_SECONDS", "5"))
+DIAL_FLUSH_SIZE = int(os.getenv("DIAL_FLUSH_SIZE", "100"))
+# "1": a call outcome is committed before the request returns (concurrent outcomes share one write).
+# "0": outcomes are acknowledged from memory; a crash loses up to DIAL_FLUSH_SECONDS of them
+DIAL_SYNC_OUTCOMES = os.getenv("DIAL_SYNC_OUTCOMES", "1") == "1"
+# Campaign stat counters are rebuilt from phone_contacts on read once they are older than this
+CAMPAIGN_STATS_RECONCILE_SECONDS = int(os.getenv("CAMPAIGN_STATS_RECONCILE_SECONDS", "300"))
+
+# Country calling code assumed for phone numbers written without a "+" prefix
+PHONE_DEFAULT_COUNTRY_CODE = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "1")
+
+# Live stats push: coalescing window, and an optional Redis URL to fan out across API processes
+LIVE_STATS_INTERVAL_SECONDS = float(os.getenv("LIVE_STATS_INTERVAL_SECONDS", "1"))
+REDIS_URL = os.getenv("REDIS_URL")
+
+# CSV imports: rows parsed, validated and loaded per chunk
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# Background import jobs: worker threads per API process, and where uploads wait for them
+IMPORT_JOB_WORKERS = int(os.getenv("IMPORT_JOB_WORKERS", "2"))
+IMPORT_JOB_DIR = os.getenv("IMPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "polistudio-imports"))
+# Parallel CSV parsing: parser processes per import, and bytes of CSV per shard handed to one
+IMPORT_PARSE_WORKERS = int(os.getenv("IMPORT_PARSE_WORKERS", str(os.cpu_count() or 1)))
+IMPORT_SHARD_BYTES = int(os.getenv("IMPORT_SHARD_BYTES", str(16 * 1024 * 1024)))
\ No newline at end of file
@@ -0,0 +1,263 @@
+# backend/csv_rows.py
+# Parsing and validation of import CSVs, row by row and shard by shard. Kept
+# free of database imports so parse worker processes can load it on their own.
+import csv
+import io
+from typing import IO, Callable, Iterator, List, Optional, Sequence, Tuple
+
+from config import IMPORT_CHUNK_SIZE, IMPORT_SHARD_BYTES
+from phone_numbers import normalize_phone
+from voter_matching import voter_match_key
+
+# Rejected rows listed individually in an import report; the rest are only counted
+MAX_REPORTED_REJECTS = 100
+
+CONTACT_REQUIRED_FIELDS = ("first_name", "last_name", "phone_number")
+VOTER_REQUIRED_FIELDS = ("first_name", "last_name")
+DONOR_REQUIRED_FIELDS = ("name", "email")
+
+# Appended to every shard as its own record; parsing only reaches it when the shard ended outside a quoted field
+SHARD_END = "\x1fPOLISTUDIO-SHARD-END\x1f"
+
+
+class CsvImportError(ValueError):
+    """The upload as a whole cannot be imported (bad encoding, missing columns)."""
+
+
+def read_csv_chunks(file_obj: IO[bytes], required_fields: Sequence[str], chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[List[Tuple[int, dict]]]:
+    """
+    Decode and parse a binary upload incrementally, yielding lists of
+    (line number, row) of at most chunk_size rows. Only one chunk is held in
+    memory at a time. Raises CsvImportError for missing columns or non-UTF-8 input.
+    """
+    file_obj.seek(0)
+    text = io.TextIOWrapper(file_obj, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        headers = reader.fieldnames or []
+        missing = [field for field in required_fields if field not in headers]
+        if missing:
+            raise CsvImportError(f"CSV must contain the following columns: {', '.join(required_fields)}")
+        chunk = []
+        for row in reader:
+            chunk.append((reader.line_num, row))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    except UnicodeDecodeError:
+        raise CsvImportError("Invalid file encoding. Please use UTF-8")
+    finally:
+        # Leave the upload open; closing it is the framework's job
+        text.detach()
+
+
+def _clean(row: dict, field: str) -> str:
+    return (row.get(field) or "").strip()
+
+
+def parse_contact_row(row: dict, require_valid_phone: bool = False) -> dict:
+    """
+    Validate one contacts CSV row; raises ValueError with a reason for rows
+    that cannot be called. A number that does not normalize is kept as
+    written with no phone_key, unless require_valid_phone (deduplicating
+    imports need the key) makes it a reject.
+    """
+    first_name = _clean(row, "first_name")
+    last_name = _clean(row, "last_name")
+    phone_number = _clean(row, "phone_number")
+    if not phone_number:
+        raise ValueError("phone_number is empty")
+    phone_key = normalize_phone(phone_number)
+    if phone_key is None and require_valid_phone:
+        raise ValueError(f"phone_number {phone_number!r} is not a valid phone number")
+    if not first_name and not last_name:
+        raise ValueError("first_name and last_name are both empty")
+    return {
+        "first_name": first_name,
+        "last_name": last_name,
+        "phone_number": phone_number,
+        "phone_key": phone_key,
+        "additional_info": _clean(row, "additional_info"),
+    }
+
+
+def parse_voter_row(row: dict) -> Optional[dict]:
+    """
+    Validate one voters CSV row. Returns None for repeated header rows, which
+    are skipped rather than rejected; raises ValueError for unusable rows.
+    A support level that is not a number becomes 0 and an email without an
+    "@" is dropped rather than rejecting the voter.
+    """
+    first_name = _clean(row, "first_name")
+    last_name = _clean(row, "last_name")
+    if first_name.lower() == "first name" and last_name.lower() == "last name":
+        return None
+    if not first_name and not last_name:
+        raise ValueError("first_name and last_name are both empty")
+    try:
+        support_level = int(_clean(row, "support_level") or 0)
+    except ValueError:
+        support_level = 0
+    phone = _clean(row, "phone")
+    email = _clean(row, "email")
+    address = _clean(row, "address")
+    external_id = _clean(row, "external_id") or _clean(row, "voter_id") or None
+    return {
+        "first_name": first_name,
+        "last_name": last_name,
+        "address": address,
+        "support_level": support_level,
+        "phone": phone,
+        "phone_key": normalize_phone(phone),
+        "email": email if "@" in email else "",
+        "external_id": external_id,
+        "match_key": voter_match_key(first_name, last_name, address, external_id),
+    }
+
+
+def parse_donor_row(row: dict) -> dict:
+    """Validate one donors CSV row; raises ValueError for rows without a name or a usable email."""
+    name = _clean(row, "name")
+    email = _clean(row, "email")
+    if not name:
+        raise ValueError("name is empty")
+    if "@" not in email:
+        raise ValueError(f"email {email!r} is not an email address")
+    return {
+        "name": name,
+        "email": email,
+        "phone": _clean(row, "phone"),
+        "address": _clean(row, "address") or None,
+    }
+
+
+class ShardResult:
+    """One shard's parsed rows, numbered by data row within the shard, and its rejects."""
+
+    def __init__(self):
+        self.rows: List[Tuple[int, dict]] = []
+        self.rows_read = 0
+        self.lines = 0
+        # False when the shard's end fell inside a quoted field, so its rows cannot be trusted
+        self.complete = True
+        # (data row, line, error) for the first MAX_REPORTED_REJECTS rejects; every rejected data row is in reject_rows
+        self.rejected: List[Tuple[int, int, str]] = []
+        self.reject_rows: List[int] = []
+
+
+def read_header(file_obj: IO[bytes], required_fields: Sequence[str]) -> Tuple[List[str], int]:
+    """The column names and the byte offset where the data rows start."""
+    file_obj.seek(0)
+    first_line = file_obj.readline()
+    try:
+        header = first_line.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise CsvImportError("Invalid file encoding. Please use UTF-8")
+    fieldnames = next(csv.reader([header]), [])
+    missing = [field for field in required_fields if field not in fieldnames]
+    if missing:
+        raise CsvImportError(f"CSV must contain the following columns: {', '.join(required_fields)}")
+    return fieldnames, len(first_line)
+
+
+def split_at_line_boundaries(file_obj: IO[bytes], start: int, shard_bytes: int = IMPORT_SHARD_BYTES) -> List[Tuple[int, int]]:
+    """
+    Byte ranges of roughly shard_bytes that each end at a newline. A newline
+    is only taken as a cut when an even number of quote characters precede
+    it, which keeps well-formed quoted fields with embedded newlines whole;
+    counting quotes is a byte scan, far cheaper than parsing. A stray quote
+    inside an unquoted field (O"Brien) throws the count off, so the cuts are
+    only candidates: parse_shard reports whether its shard really ended on a
+    record boundary.
+    """
+    file_obj.seek(start)
+    ranges = []
+    begin = start
+    in_quotes = False
+    while True:
+        block = file_obj.read(shard_bytes)
+        if not block:
+            break
+        in_quotes ^= block.count(b'"') % 2 == 1
+        tail = block[-1:]
+        while tail != b"\n" or in_quotes:
+            line = file_obj.readline()
+            if not line:
+                break
+            in_quotes ^= line.count(b'"') % 2 == 1
+            tail = line[-1:]
+        end = file_obj.tell()
+        ranges.append((begin, end))
+        begin = end
+    return ranges
+
+
+def _parse_record(result: ShardResult, parse: Callable[[dict], Optional[dict]], raw: dict, line: int):
+    result.rows_read += 1
+    try:
+        row = parse(raw)
+    except ValueError as e:
+        result.reject_rows.append(result.rows_read)
+        if len(result.rejected) < MAX_REPORTED_REJECTS:
+            result.rejected.append((result.rows_read, line, str(e)))
+        return
+    if row is not None:
+        result.rows.append((result.rows_read, row))
+
+
+def parse_shard(path: str, start: int, end: int, fieldnames: List[str], parse: Callable[[dict], Optional[dict]]) -> ShardResult:
+    """
+    Parse and validate one byte range of the file with `parse` (a row parser,
+    or a functools.partial of one, so it pickles); runs in a worker process.
+    The shard is parsed with SHARD_END appended: the shard ended on a record
+    boundary only if that comes back as the last record on its own, otherwise
+    it was swallowed by a quoted field and the result is marked incomplete.
+    """
+    with open(path, "rb") as file_obj:
+        file_obj.seek(start)
+        data = file_obj.read(end - start)
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        raise CsvImportError("Invalid file encoding. Please use UTF-8")
+    if text and not text.endswith("\n"):
+        text += "\n"
+
+    result = ShardResult()
+    result.complete = False
+    reader = csv.DictReader(io.StringIO(text + SHARD_END + "\n", newline=""), fieldnames=fieldnames)
+    for raw in reader:
+        if raw[fieldnames[0]] == SHARD_END and all(raw[field] is None for field in fieldnames[1:]) and None not in raw:
+            result.complete = True
+            break
+        _parse_record(result, parse, raw, reader.line_num)
+    result.lines = reader.line_num - 1
+    return result
+
+
+def parse_serially(
+    path: str, start: int, fieldnames: List[str], parse: Callable[[dict], Optional[dict]], rows_per_result: int = IMPORT_CHUNK_SIZE
+) -> Iterator[ShardResult]:
+    """
+    Parse the file from byte offset `start` (a record boundary) to the end in
+    this process, as ShardResults of up to rows_per_result rows each.
+    """
+    with open(path, "rb") as file_obj:
+        file_obj.seek(start)
+        reader = csv.DictReader(io.TextIOWrapper(file_obj, encoding="utf-8", newline=""), fieldnames=fieldnames)
+        result, lines_before = ShardResult(), 0
+        try:
+            for raw in reader:
+                _parse_record(result, parse, raw, reader.line_num - lines_before)
+                if result.rows_read >= rows_per_result:
+                    result.lines = reader.line_num - lines_before
+                    lines_before = reader.line_num
+                    yield result
+                    result = ShardResult()
+        except UnicodeDecodeError:
+            raise CsvImportError("Invalid file encoding. Please use UTF-8")
+        result.lines = reader.line_num - lines_before
+        if result.rows_read or result.lines:
+            yield result
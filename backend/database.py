@@ -4,6 +4,9 @@ from sqlalchemy.orm import sessionmaker
 from models import Base  # Import Base from models
 from config import DATABASE_URL
 
+# Keep IN (...) lists well below driver/database parameter limits
+LOOKUP_CHUNK_SIZE = 500
+
 # Create engine
 engine = create_engine(DATABASE_URL, echo=True)
 
@@ -13,6 +16,14 @@ Base.metadata.create_all(bind=engine)
 # Create a SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def dialect_insert(db, table):
+    """INSERT construct for the session's database, with on_conflict_do_* support on PostgreSQL and SQLite."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
 # Dependency for FastAPI to create a session per request
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,400 @@
+# backend/dialer.py
+import datetime
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, bindparam, case, or_, select, update
+from sqlalchemy.orm import Session
+
+from campaign_stats import apply_stat_deltas, outcome_deltas
+from config import (
+    DIAL_FLUSH_SECONDS,
+    DIAL_FLUSH_SIZE,
+    DIAL_PREFETCH_SIZE,
+    DIAL_SYNC_OUTCOMES,
+    PHONE_CLAIM_TTL_MINUTES,
+    PHONE_RETRY_AFTER_MINUTES,
+)
+from database import LOOKUP_CHUNK_SIZE, SessionLocal
+from models import PhoneBankingCampaign, PhoneContact
+
+# Outcomes worth another attempt later in the campaign
+RETRY_STATUSES = ("call_back", "no_answer")
+CONTACT_FIELDS = (
+    "id", "campaign_id", "first_name", "last_name", "phone_number", "additional_info",
+    "status", "support_level", "notes", "last_called", "volunteer_id", "claim_expires_at",
+)
+
+
+def pending_filter():
+    return or_(PhoneContact.status == "pending", PhoneContact.status.is_(None))
+
+
+def _claim_ttl() -> datetime.timedelta:
+    return datetime.timedelta(minutes=PHONE_CLAIM_TTL_MINUTES)
+
+
+def _dial_priority(entry: dict):
+    status = entry["status"]
+    rank = 0 if status in (None, "pending") else 1 if status == "call_back" else 2
+    return (rank, entry["last_called"] is not None, entry["last_called"] or datetime.datetime.min, entry["id"])
+
+
+def _as_entry(contact: PhoneContact) -> dict:
+    return {field: getattr(contact, field) for field in CONTACT_FIELDS}
+
+
+def lease_contacts(db: Session, campaign_id: int, limit: int) -> List[dict]:
+    """
+    Lease up to `limit` dialable contacts in one statement, best first: pending,
+    then call-backs, then no-answers, least recently called first. Retries are
+    only eligible PHONE_RETRY_AFTER_MINUTES after the last attempt. Leased rows
+    get a claim_expires_at but no volunteer; FOR UPDATE SKIP LOCKED and the
+    unexpired lease keep other workers off them until the lease lapses.
+    The caller commits.
+    """
+    now = datetime.datetime.utcnow()
+    retry_before = now - datetime.timedelta(minutes=PHONE_RETRY_AFTER_MINUTES)
+    priority = case((pending_filter(), 0), (PhoneContact.status == "call_back", 1), else_=2)
+    candidates = select(PhoneContact.id).where(
+        PhoneContact.campaign_id == campaign_id,
+        or_(
+            pending_filter(),
+            and_(
+                PhoneContact.status.in_(RETRY_STATUSES),
+                or_(PhoneContact.last_called.is_(None), PhoneContact.last_called < retry_before)
+            )
+        ),
+        or_(PhoneContact.claim_expires_at.is_(None), PhoneContact.claim_expires_at < now)
+    ).order_by(
+        priority,
+        PhoneContact.last_called.asc().nulls_first(),
+        PhoneContact.id
+    ).limit(limit).with_for_update(skip_locked=True).scalar_subquery()
+
+    statement = update(PhoneContact).where(PhoneContact.id.in_(candidates)).values(
+        claim_expires_at=now + _claim_ttl()
+    ).returning(PhoneContact)
+    contacts = db.scalars(statement, execution_options={"synchronize_session": False}).all()
+    return sorted((_as_entry(contact) for contact in contacts), key=_dial_priority)
+
+
+def write_call_outcomes(db: Session, outcomes: List[dict]):
+    """
+    Write call outcomes with one executemany UPDATE. Each row has b_id,
+    b_status, b_support_level, b_notes and b_last_called; the claim is cleared.
+    The caller commits.
+    """
+    if not outcomes:
+        return
+    table = PhoneContact.__table__
+    db.execute(
+        update(table).where(table.c.id == bindparam("b_id")).values(
+            status=bindparam("b_status"),
+            support_level=bindparam("b_support_level"),
+            notes=bindparam("b_notes"),
+            last_called=bindparam("b_last_called"),
+            claim_expires_at=None,
+        ),
+        outcomes
+    )
+
+
+def apply_call_outcomes(db: Session, user_id: int, outcomes: List[dict]) -> List[dict]:
+    """
+    Apply a batch of call outcomes ({contact_id, status, support_level, notes})
+    for the user's campaigns in one transaction: one SELECT per
+    LOOKUP_CHUNK_SIZE ids, one executemany UPDATE and one stat counter upsert.
+    Returns a result per input row, in order. When an id repeats, the last
+    outcome wins. The caller commits.
+    """
+    # Outcomes still buffered in the dial queue must land first, or the deltas below would start from stale values
+    dial_queues.flush()
+    contact_ids = list({outcome["contact_id"] for outcome in outcomes})
+    current: Dict[int, dict] = {}
+    for start in range(0, len(contact_ids), LOOKUP_CHUNK_SIZE):
+        rows = db.query(
+            PhoneContact.id, PhoneContact.campaign_id, PhoneContact.volunteer_id,
+            PhoneContact.status, PhoneContact.support_level
+        ).join(PhoneBankingCampaign, PhoneBankingCampaign.id == PhoneContact.campaign_id).filter(
+            PhoneBankingCampaign.user_id == user_id,
+            PhoneContact.id.in_(contact_ids[start:start + LOOKUP_CHUNK_SIZE])
+        ).all()
+        current.update({row.id: row._asdict() for row in rows})
+
+    # Contacts the dial queue still holds are settled here instead
+    dial_queues.release(current)
+
+    now = datetime.datetime.utcnow()
+    deltas = Counter()
+    writes: Dict[int, dict] = {}
+    results = []
+    for outcome in outcomes:
+        contact = current.get(outcome["contact_id"])
+        if contact is None:
+            results.append({"contact_id": outcome["contact_id"], "ok": False, "error": "Contact not found"})
+            continue
+        outcome_deltas(deltas, contact["campaign_id"], contact["volunteer_id"],
+                       contact["status"], contact["support_level"], outcome["status"], outcome["support_level"])
+        contact.update(status=outcome["status"], support_level=outcome["support_level"])
+        writes[contact["id"]] = {
+            "b_id": contact["id"],
+            "b_status": outcome["status"],
+            "b_support_level": outcome["support_level"],
+            "b_notes": outcome["notes"],
+            "b_last_called": now,
+        }
+        results.append({"contact_id": contact["id"], "ok": True, "error": None})
+
+    write_call_outcomes(db, list(writes.values()))
+    apply_stat_deltas(db, deltas)
+    return results
+
+
+def load_volunteer_claims(db: Session, campaign_id: int, volunteer_id: int) -> List[dict]:
+    """Contacts served to a volunteer that are still claimed and not yet called."""
+    contacts = db.query(PhoneContact).filter(
+        PhoneContact.campaign_id == campaign_id,
+        PhoneContact.volunteer_id == volunteer_id,
+        PhoneContact.claim_expires_at > datetime.datetime.utcnow()
+    ).order_by(PhoneContact.id).all()
+    return [_as_entry(contact) for contact in contacts]
+
+
+class DialQueue:
+    """Leased contacts for one campaign, plus what each volunteer has been served but not yet called."""
+
+    def __init__(self, campaign_id: int):
+        self.campaign_id = campaign_id
+        self.ready = deque()
+        self.held: Dict[int, "OrderedDict[int, dict]"] = {}
+
+
+class DialQueues:
+    """
+    Per-campaign dial queues. Each queue is filled from the database in
+    DIAL_PREFETCH_SIZE leases and serves contacts from memory; volunteer
+    assignments are buffered and written back in batches by a background
+    flusher every DIAL_FLUSH_SECONDS. Call outcomes are buffered too: with
+    sync_outcomes each one is flushed before it is acknowledged, in a write
+    shared with whatever else is waiting; without, they wait for the flusher
+    (sooner once DIAL_FLUSH_SIZE are waiting) and a crash loses them. Leases
+    keep several API processes from serving the same contact. The lock only
+    guards the in-memory state; no database work happens while it is held.
+    """
+
+    def __init__(self, session_factory=SessionLocal, prefetch_size: int = DIAL_PREFETCH_SIZE,
+                 flush_seconds: float = DIAL_FLUSH_SECONDS, flush_size: int = DIAL_FLUSH_SIZE,
+                 sync_outcomes: bool = DIAL_SYNC_OUTCOMES):
+        self.session_factory = session_factory
+        self.prefetch_size = prefetch_size
+        self.flush_seconds = flush_seconds
+        self.flush_size = flush_size
+        self.sync_outcomes = sync_outcomes
+        self._queues: Dict[int, DialQueue] = {}
+        self._leased: Dict[int, dict] = {}  # contact id -> entry, for contacts still waiting in a ready queue
+        self._served: Dict[int, dict] = {}  # contact id -> entry, for contacts awaiting an outcome
+        self._assignments: List[dict] = []
+        self._outcomes: List[dict] = []
+        self._stat_deltas = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = False
+
+    def next_contacts(self, db: Session, campaign_id: int, volunteer_id: int, count: int) -> List[dict]:
+        """
+        Up to `count` contacts for a volunteer: their outstanding claims first,
+        then fresh contacts off the campaign queue. The database is only touched
+        to refill the queue and the first time a volunteer is seen, outside the
+        lock; refills are committed on `db` straight away so the lease holds
+        even if the request later fails.
+        """
+        now = datetime.datetime.utcnow()
+        expires = now + _claim_ttl()
+        claims = None
+        exhausted = False
+        while True:
+            with self._lock:
+                queue = self._queues.get(campaign_id)
+                if queue is None:
+                    queue = self._queues[campaign_id] = DialQueue(campaign_id)
+                held = queue.held.get(volunteer_id)
+                if held is None and claims is not None:
+                    held = queue.held[volunteer_id] = OrderedDict()
+                    for entry in claims:
+                        held[entry["id"]] = self._served.setdefault(entry["id"], entry)
+                if held is not None:
+                    for contact_id in [contact_id for contact_id, entry in held.items() if entry["claim_expires_at"] <= now]:
+                        del held[contact_id]
+                        self._served.pop(contact_id, None)
+                    while len(held) < count and queue.ready:
+                        entry = queue.ready.popleft()
+                        if self._leased.pop(entry["id"], None) is None:
+                            continue  # settled elsewhere while queued
+                        if entry["claim_expires_at"] <= now:
+                            continue  # lease lapsed while queued; another worker may have taken it
+                        entry["volunteer_id"] = volunteer_id
+                        entry["claim_expires_at"] = expires
+                        held[entry["id"]] = entry
+                        self._served[entry["id"]] = entry
+                        self._assignments.append({"b_id": entry["id"], "b_volunteer_id": volunteer_id, "b_claim_expires_at": expires})
+                    if len(held) >= count or exhausted:
+                        batch = [dict(entry) for entry in list(held.values())[:count]]
+                        break
+                    wanted = count - len(held)
+
+            if held is None:
+                claims = load_volunteer_claims(db, campaign_id, volunteer_id)
+                continue
+            # Other requests may take some of these before this one re-locks; it then leases again
+            leased = lease_contacts(db, campaign_id, max(self.prefetch_size, wanted))
+            db.commit()
+            exhausted = not leased
+            with self._lock:
+                queue = self._queues.get(campaign_id)
+                if queue is None:
+                    queue = self._queues[campaign_id] = DialQueue(campaign_id)
+                queue.ready.extend(leased)
+                self._leased.update((entry["id"], entry) for entry in leased)
+        if self._assignments:
+            self.start()
+        return batch
+
+    def record_outcome(self, contact_id: int, status: Optional[str], support_level: Optional[int], notes: Optional[str]) -> Optional[dict]:
+        """
+        Buffer a call outcome for a contact this queue served and return the
+        updated contact, after flushing it when sync_outcomes is set. Returns
+        None for contacts it does not hold, which the caller then writes
+        directly.
+        """
+        now = datetime.datetime.utcnow()
+        with self._lock:
+            entry = self._served.pop(contact_id, None)
+            if entry is None:
+                return None
+            queue = self._queues.get(entry["campaign_id"])
+            if queue is not None:
+                queue.held.get(entry["volunteer_id"], {}).pop(contact_id, None)
+            outcome_deltas(self._stat_deltas, entry["campaign_id"], entry["volunteer_id"],
+                           entry["status"], entry["support_level"], status, support_level)
+            entry.update(status=status, support_level=support_level, notes=notes, last_called=now, claim_expires_at=None)
+            self._outcomes.append({
+                "b_id": contact_id,
+                "b_status": status,
+                "b_support_level": support_level,
+                "b_notes": notes,
+                "b_last_called": now,
+            })
+            full = len(self._outcomes) >= self.flush_size
+            served = dict(entry)
+        if self.sync_outcomes:
+            self.flush()
+            return served
+        self.start()
+        if full:
+            self._wake.set()
+        return served
+
+    def release(self, contact_ids: Iterable[int]):
+        """
+        Stop tracking contacts whose outcome is being written elsewhere, whether
+        still queued or already served. Buffered assignments are flushed first,
+        so a late flush cannot re-claim a contact that has already been called.
+        """
+        with self._lock:
+            held = []
+            for contact_id in contact_ids:
+                if contact_id in self._served:
+                    held.append(contact_id)
+                self._leased.pop(contact_id, None)
+        if not held:
+            return
+        self.flush()
+        with self._lock:
+            for contact_id in held:
+                entry = self._served.pop(contact_id, None)
+                if entry is None:
+                    continue
+                queue = self._queues.get(entry["campaign_id"])
+                if queue is not None:
+                    queue.held.get(entry["volunteer_id"], {}).pop(contact_id, None)
+
+    def discard(self, campaign_id: int):
+        """Forget a campaign's queue, e.g. after the campaign is deleted."""
+        with self._lock:
+            queue = self._queues.pop(campaign_id, None)
+            if queue is None:
+                return
+            for held in queue.held.values():
+                for contact_id in held:
+                    self._served.pop(contact_id, None)
+            for entry in queue.ready:
+                self._leased.pop(entry["id"], None)
+
+    def flush(self) -> int:
+        """Write buffered assignments and outcomes with one executemany each, plus their stat counter deltas."""
+        with self._flush_lock:
+            with self._lock:
+                assignments, self._assignments = self._assignments, []
+                outcomes, self._outcomes = self._outcomes, []
+                stat_deltas, self._stat_deltas = self._stat_deltas, Counter()
+            if not assignments and not outcomes:
+                return 0
+            table = PhoneContact.__table__
+            db = self.session_factory()
+            try:
+                # Assignments first: an outcome clears the claim its assignment set
+                if assignments:
+                    db.execute(
+                        update(table).where(table.c.id == bindparam("b_id")).values(
+                            volunteer_id=bindparam("b_volunteer_id"),
+                            claim_expires_at=bindparam("b_claim_expires_at"),
+                        ),
+                        assignments
+                    )
+                write_call_outcomes(db, outcomes)
+                apply_stat_deltas(db, stat_deltas)
+                db.commit()
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    self._assignments[:0] = assignments
+                    self._outcomes[:0] = outcomes
+                    self._stat_deltas.update(stat_deltas)
+                raise
+            finally:
+                db.close()
+            return len(assignments) + len(outcomes)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="dial-queue-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Final dial queue flush failed: {e}")
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Dial queue flush failed: {e}")
+
+
+dial_queues = DialQueues()
@@ -0,0 +1,369 @@
+# backend/geocoding.py
+import datetime
+import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from geopy.exc import GeopyError
+from geopy.geocoders import Nominatim
+from sqlalchemy import bindparam, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from addresses import normalize_address
+from config import (
+    GEOCODE_BATCH_SIZE,
+    GEOCODE_CACHE_TTL_DAYS,
+    GEOCODE_CONCURRENCY,
+    GEOCODE_NEGATIVE_TTL_DAYS,
+    GEOCODE_RATE_LIMIT,
+    GEOCODER_BACKEND,
+)
+from database import LOOKUP_CHUNK_SIZE, SessionLocal
+from models import GeocodeCache, Voter
+from turf_membership import refresh_voter_memberships
+
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "refreshes": 0, "not_found": 0, "errors": 0}
+
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def get_cache_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"] + stats["refreshes"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def geocode_query(address: str) -> str:
+    # Ensure the address is in Minneapolis, MN by appending it if not already present.
+    if "Minneapolis" not in address:
+        address = f"{address}, Minneapolis, MN"
+    return address
+
+
+# ===== Geocoder backends =====
+
+class GeocodingError(Exception):
+    """Raised by a geocoder when a lookup failed for a transient reason and should be retried later."""
+
+
+class NominatimGeocoder:
+    def __init__(self, user_agent: str = "polistudio"):
+        self._client = Nominatim(user_agent=user_agent)
+
+    def geocode(self, query: str) -> Optional[Tuple[float, float]]:
+        try:
+            location = self._client.geocode(query)
+        except GeopyError as e:
+            raise GeocodingError(str(e)) from e
+        if location:
+            return location.latitude, location.longitude
+        return None
+
+
+class LocalGeocoder:
+    """
+    Offline stand-in for a real geocoder. Known addresses resolve to their given
+    coordinates; anything else is placed deterministically inside `bounds` from a
+    hash of its normalized form, so the same address always lands on the same point.
+    """
+
+    # (min_lat, min_lng, max_lat, max_lng) roughly covering Minneapolis
+    DEFAULT_BOUNDS = (44.89, -93.33, 45.05, -93.19)
+
+    def __init__(self, known: Optional[Dict[str, Tuple[float, float]]] = None, bounds: Tuple[float, float, float, float] = DEFAULT_BOUNDS, unknown_not_found: bool = False):
+        self.known = {normalize_address(address): coords for address, coords in (known or {}).items()}
+        self.bounds = bounds
+        self.unknown_not_found = unknown_not_found
+        self.calls = 0
+
+    def geocode(self, query: str) -> Optional[Tuple[float, float]]:
+        self.calls += 1
+        key = normalize_address(query)
+        if key in self.known:
+            return self.known[key]
+        if self.unknown_not_found:
+            return None
+        digest = hashlib.sha1(key.encode("utf-8")).digest()
+        lat_fraction = int.from_bytes(digest[:4], "big") / 0xFFFFFFFF
+        lng_fraction = int.from_bytes(digest[4:8], "big") / 0xFFFFFFFF
+        min_lat, min_lng, max_lat, max_lng = self.bounds
+        return min_lat + lat_fraction * (max_lat - min_lat), min_lng + lng_fraction * (max_lng - min_lng)
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads; a rate of 0 disables limiting."""
+
+    def __init__(self, rate_per_second: float):
+        self._interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_geocoder = LocalGeocoder() if GEOCODER_BACKEND == "local" else NominatimGeocoder()
+_rate_limiter = RateLimiter(0 if GEOCODER_BACKEND == "local" else GEOCODE_RATE_LIMIT)
+
+
+def get_geocoder():
+    return _geocoder
+
+
+def set_geocoder(geocoder, rate_limit: float = 0):
+    """Swap the geocoder backend, e.g. for a LocalGeocoder in tests or offline environments."""
+    global _geocoder, _rate_limiter
+    _geocoder = geocoder
+    _rate_limiter = RateLimiter(rate_limit)
+
+
+_FAILED = object()
+
+
+def _resolve_queries(queries: List[str], max_workers: int) -> Dict[str, object]:
+    geocoder = _geocoder
+    limiter = _rate_limiter
+
+    def lookup(query):
+        limiter.wait()
+        try:
+            return geocoder.geocode(query)
+        except GeocodingError:
+            return _FAILED
+
+    if max_workers <= 1 or len(queries) <= 1:
+        results = [lookup(query) for query in queries]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(lookup, queries))
+    return dict(zip(queries, results))
+
+
+# ===== Persistent cache =====
+
+def _is_fresh(entry: GeocodeCache, now: datetime.datetime) -> bool:
+    if entry.updated_at is None:
+        return False
+    ttl_days = GEOCODE_CACHE_TTL_DAYS if entry.found else GEOCODE_NEGATIVE_TTL_DAYS
+    return now - entry.updated_at < datetime.timedelta(days=ttl_days)
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def geocode_addresses(db: Session, addresses: Iterable[str], max_workers: int = 1) -> Dict[str, Optional[Tuple[float, float]]]:
+    """
+    Resolve many addresses to (lat, lng) through the persistent geocode cache.
+    Only cache misses and expired entries reach the geocoder, `max_workers` at a
+    time; addresses that could not be found map to None and addresses whose
+    lookup failed transiently are omitted.
+    """
+    keys = {}
+    for address in set(addresses):
+        if address:
+            query = geocode_query(address)
+            keys[address] = (normalize_address(query), query)
+
+    entries = {}
+    for chunk in _chunks(list({key for key, _ in keys.values()}), LOOKUP_CHUNK_SIZE):
+        for entry in db.query(GeocodeCache).filter(GeocodeCache.address_key.in_(chunk)).all():
+            entries[entry.address_key] = entry
+
+    now = datetime.datetime.utcnow()
+    to_resolve = {}
+    for key, query in keys.values():
+        entry = entries.get(key)
+        if entry is not None and _is_fresh(entry, now):
+            _count("hits")
+        elif key not in to_resolve:
+            _count("misses" if entry is None else "refreshes")
+            to_resolve[key] = query
+
+    resolved = _resolve_queries(list(to_resolve.values()), max_workers)
+    failed = set()
+    for key, query in to_resolve.items():
+        coordinates = resolved[query]
+        if coordinates is _FAILED:
+            # Transient geocoder failures are not cached so the next lookup retries them
+            _count("errors")
+            failed.add(key)
+            continue
+        entry = entries.get(key)
+        if entry is None:
+            entry = GeocodeCache(address_key=key)
+            db.add(entry)
+            entries[key] = entry
+        entry.query = query
+        entry.found = coordinates is not None
+        entry.latitude = coordinates[0] if coordinates else None
+        entry.longitude = coordinates[1] if coordinates else None
+        entry.updated_at = now
+        if not coordinates:
+            _count("not_found")
+
+    # Addresses whose lookup failed are left out entirely, so callers can tell them apart from "not found"
+    results = {}
+    for address, (key, _) in keys.items():
+        if key in failed:
+            continue
+        entry = entries.get(key)
+        results[address] = (entry.latitude, entry.longitude) if entry is not None and entry.found else None
+
+    if to_resolve:
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request cached the same address first; its entry is just as good
+            db.rollback()
+    return results
+
+
+def geocode_address(db: Session, address: str) -> Optional[Tuple[float, float]]:
+    return geocode_addresses(db, [address]).get(address)
+
+
+# ===== Background voter geocoding =====
+
+class GeocodingPipeline:
+    """
+    Geocodes voters in the background so turf reads only ever touch stored
+    coordinates. Voter ids are queued by the ingest paths and processed in
+    batches; each batch goes through the geocode cache with bounded concurrency
+    and the shared rate limiter, then refreshes those voters' turf membership.
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = GEOCODE_BATCH_SIZE, max_workers: int = GEOCODE_CONCURRENCY):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = None
+        self._stopping = False
+
+    def enqueue(self, voter_ids: Iterable[int]):
+        with self._lock:
+            new_ids = [voter_id for voter_id in voter_ids if voter_id not in self._queued]
+            self._queued.update(new_ids)
+            if new_ids:
+                self._idle.clear()
+        for voter_id in new_ids:
+            self._queue.put(voter_id)
+        if new_ids:
+            self.start()
+
+    def sweep(self):
+        """Queue every voter that has never been geocoded, e.g. rows loaded before the pipeline existed."""
+        db = self.session_factory()
+        try:
+            voter_ids = [row.id for row in db.query(Voter.id).filter(Voter.geocoded_at.is_(None)).all()]
+        finally:
+            db.close()
+        self.enqueue(voter_ids)
+        return len(voter_ids)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="geocoding-pipeline", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopping = True
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        while not self._stopping:
+            voter_id = self._queue.get()
+            if voter_id is None:
+                break
+            batch = [voter_id]
+            while len(batch) < self.batch_size:
+                try:
+                    voter_id = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if voter_id is None:
+                    self._stopping = True
+                    break
+                batch.append(voter_id)
+            with self._lock:
+                self._queued.difference_update(batch)
+            try:
+                self.process_batch(batch)
+            except Exception as e:
+                print(f"Geocoding batch of {len(batch)} voters failed: {e}")
+            with self._lock:
+                if not self._queued:
+                    self._idle.set()
+
+    def process_batch(self, voter_ids: List[int]) -> int:
+        db = self.session_factory()
+        try:
+            voters = db.query(Voter.id, Voter.address).filter(Voter.id.in_(voter_ids)).all()
+            coordinates = geocode_addresses(db, (voter.address for voter in voters), max_workers=self.max_workers)
+            now = datetime.datetime.utcnow()
+            params = []
+            for voter in voters:
+                if voter.address and voter.address not in coordinates:
+                    continue  # transient failure, leave it ungeocoded for the next sweep
+                coords = coordinates.get(voter.address) if voter.address else None
+                params.append({
+                    "b_id": voter.id,
+                    "b_address": voter.address,
+                    "b_latitude": coords[0] if coords else None,
+                    "b_longitude": coords[1] if coords else None,
+                    "b_geocoded_at": now,
+                })
+            if params:
+                # Matching on the address read above keeps a concurrent address edit from being overwritten
+                statement = (
+                    update(Voter.__table__)
+                    .where(Voter.__table__.c.id == bindparam("b_id"))
+                    .where(Voter.__table__.c.address.is_not_distinct_from(bindparam("b_address")))
+                    .values(
+                        latitude=bindparam("b_latitude"),
+                        longitude=bindparam("b_longitude"),
+                        geocoded_at=bindparam("b_geocoded_at"),
+                    )
+                )
+                db.execute(statement, params)
+                # Only the voters just geocoded need their turf membership re-derived
+                refresh_voter_memberships(db, [param["b_id"] for param in params])
+                db.commit()
+            return len(params)
+        finally:
+            db.close()
+
+
+geocoding_pipeline = GeocodingPipeline()
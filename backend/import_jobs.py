@@ -0,0 +1,99 @@
+# backend/import_jobs.py
+import datetime
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Callable, Optional
+
+from config import IMPORT_JOB_DIR, IMPORT_JOB_WORKERS
+from database import SessionLocal
+from importers import ImportInterrupted, ImportReport
+from models import ImportJob
+
+
+class LocalJobBackend:
+    """Runs jobs on a thread pool inside the API process."""
+
+    def __init__(self, max_workers: int = IMPORT_JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import-job")
+
+    def submit(self, fn: Callable, *args):
+        self._executor.submit(fn, *args)
+
+    def shutdown(self):
+        # Queued jobs that never started stay "queued"; running ones finish their current chunk or are cut off
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ImportJobs:
+    """
+    Accepts uploads for background import: the upload is spooled to
+    IMPORT_JOB_DIR, an import_jobs row is created and the import runs on the
+    backend while the request returns the job id. The row's status and report
+    are updated after every chunk, so any API process can answer status polls.
+    """
+
+    def __init__(self, backend=None, session_factory=SessionLocal, spool_dir: str = IMPORT_JOB_DIR):
+        self.backend = backend or LocalJobBackend()
+        self.session_factory = session_factory
+        self.spool_dir = spool_dir
+
+    def submit(self, kind: str, owner_id: int, upload: IO[bytes], filename: Optional[str], target: Callable, **kwargs) -> str:
+        """
+        Queue `target(db, file_obj, progress=..., **kwargs)` for a copy of the
+        upload and return the job id. owner_id is the user the job belongs to.
+        target returns an ImportReport and commits its own work.
+        """
+        os.makedirs(self.spool_dir, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self.spool_dir, f"{job_id}.upload")
+        upload.seek(0)
+        with open(path, "wb") as spooled:
+            shutil.copyfileobj(upload, spooled)
+
+        db = self.session_factory()
+        try:
+            db.add(ImportJob(id=job_id, kind=kind, status="queued", filename=filename, user_id=owner_id))
+            db.commit()
+        except Exception:
+            os.remove(path)
+            raise
+        finally:
+            db.close()
+        self.backend.submit(self._run, job_id, path, target, kwargs)
+        return job_id
+
+    def _update(self, job_id: str, **fields):
+        db = self.session_factory()
+        try:
+            db.query(ImportJob).filter(ImportJob.id == job_id).update(fields, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _run(self, job_id: str, path: str, target: Callable, kwargs: dict):
+        self._update(job_id, status="running", started_at=datetime.datetime.utcnow())
+
+        def progress(report: ImportReport):
+            self._update(job_id, report=report.to_dict())
+
+        db = self.session_factory()
+        try:
+            with open(path, "rb") as file_obj:
+                report = target(db, file_obj, progress=progress, **kwargs)
+            self._update(job_id, status="succeeded", report=report.to_dict(), finished_at=datetime.datetime.utcnow())
+        except ImportInterrupted as e:
+            self._update(job_id, status="failed", report=e.report.to_dict(), error=str(e), finished_at=datetime.datetime.utcnow())
+        except Exception as e:
+            db.rollback()
+            self._update(job_id, status="failed", error=str(e), finished_at=datetime.datetime.utcnow())
+        finally:
+            db.close()
+            os.remove(path)
+
+    def shutdown(self):
+        self.backend.shutdown()
+
+
+import_jobs = ImportJobs()
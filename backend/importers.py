@@ -0,0 +1,436 @@
+# backend/importers.py
+import csv
+import io
+import time
+from typing import IO, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from sqlalchemy import String, Table, bindparam, cast, exists, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from addresses import normalize_address
+from config import IMPORT_CHUNK_SIZE
+from csv_rows import (
+    CONTACT_REQUIRED_FIELDS,
+    DONOR_REQUIRED_FIELDS,
+    MAX_REPORTED_REJECTS,
+    VOTER_REQUIRED_FIELDS,
+    parse_contact_row,
+    parse_donor_row,
+    parse_voter_row,
+    read_csv_chunks,
+)
+from database import LOOKUP_CHUNK_SIZE, dialect_insert
+from models import Donor, PhoneBankingCampaign, PhoneContact, Voter
+from turf_membership import remove_voter_memberships
+from voter_matching import voter_match_key
+
+# NULL marker for COPY, so empty strings and NULLs stay distinct
+COPY_NULL = "\\N"
+
+# Voter columns a re-import may overwrite when update_existing is set
+VOTER_UPSERT_FIELDS = ("first_name", "last_name", "address", "support_level", "phone", "phone_key", "email", "external_id")
+
+
+class ImportInterrupted(Exception):
+    """An import that commits per chunk failed part-way; `report` says how far it got."""
+
+    def __init__(self, report: "ImportReport", error: Exception):
+        super().__init__(str(error))
+        self.report = report
+        self.error = error
+
+
+class ImportReport:
+    """
+    Running totals for one import: rows read, loaded and rejected, throughput,
+    and for imports that commit per chunk, the last data row that is safely
+    committed (pass it back as resume_from after a failure).
+    """
+
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_loaded = 0
+        self.rows_rejected = 0
+        self.rows_duplicate = 0
+        self.rows_updated = 0
+        self.last_committed_row = 0
+        self.rejected: List[dict] = []
+        self._started = time.perf_counter()
+        self._finished = None
+
+    @property
+    def seconds(self) -> float:
+        return (self._finished or time.perf_counter()) - self._started
+
+    def reject(self, line: int, error: Exception):
+        self.rows_rejected += 1
+        if len(self.rejected) < MAX_REPORTED_REJECTS:
+            self.rejected.append({"line": line, "error": str(error)})
+
+    def finish(self) -> "ImportReport":
+        self._finished = time.perf_counter()
+        return self
+
+    def to_dict(self) -> dict:
+        seconds = self.seconds
+        return {
+            "rows_read": self.rows_read,
+            "rows_loaded": self.rows_loaded,
+            "rows_rejected": self.rows_rejected,
+            "rows_duplicate": self.rows_duplicate,
+            "rows_updated": self.rows_updated,
+            "last_committed_row": self.last_committed_row,
+            "rejected": self.rejected,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.rows_read / seconds) if seconds else None,
+        }
+
+
+def copy_csv(db: Session, table: Table, columns: Sequence[str], buffer: IO[str]):
+    """COPY a headerless CSV buffer, with COPY_NULL marking NULLs, into these columns (PostgreSQL only)."""
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _copy_rows(db: Session, table: Table, columns: Sequence[str], rows: List[dict]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([COPY_NULL if row[column] is None else row[column] for column in columns])
+    copy_csv(db, table, columns, buffer)
+
+
+def load_rows(db: Session, table: Table, rows: List[dict]):
+    """
+    Insert already-validated rows, which must all have the same keys. Uses
+    COPY on PostgreSQL and a single executemany INSERT elsewhere. Runs inside
+    the session's transaction; the caller commits.
+    """
+    if not rows:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        _copy_rows(db, table, list(rows[0]), rows)
+    else:
+        db.execute(table.insert(), rows)
+
+
+def active_contact_phone_keys(db: Session, user_id: int, phone_keys: Iterable[str]) -> Set[str]:
+    """Which of these phone keys already belong to a contact in one of the user's active campaigns (indexed lookups)."""
+    phone_keys = list(phone_keys)
+    found = set()
+    for start in range(0, len(phone_keys), LOOKUP_CHUNK_SIZE):
+        rows = db.query(PhoneContact.phone_key).join(
+            PhoneBankingCampaign, PhoneBankingCampaign.id == PhoneContact.campaign_id
+        ).filter(
+            PhoneBankingCampaign.user_id == user_id,
+            PhoneBankingCampaign.active.is_(True),
+            PhoneContact.phone_key.in_(phone_keys[start:start + LOOKUP_CHUNK_SIZE])
+        ).distinct().all()
+        found.update(row.phone_key for row in rows)
+    return found
+
+
+def load_contact_rows(db: Session, user_id: int, rows: List[dict], dedupe: bool, report: ImportReport):
+    """
+    Load one chunk of parsed contact rows. With dedupe, rows whose phone key
+    is already in one of the user's active campaigns, or earlier in the
+    chunk, are counted as duplicates instead. The caller commits.
+    """
+    if dedupe and rows:
+        # Earlier chunks are already loaded in this transaction, so the lookup covers them too
+        taken = active_contact_phone_keys(db, user_id, {row["phone_key"] for row in rows})
+        unique = []
+        for row in rows:
+            if row["phone_key"] in taken:
+                report.rows_duplicate += 1
+                continue
+            taken.add(row["phone_key"])
+            unique.append(row)
+        rows = unique
+    load_rows(db, PhoneContact.__table__, rows)
+    report.rows_loaded += len(rows)
+
+
+def import_contacts(
+    db: Session,
+    file_obj: IO[bytes],
+    campaign_id: int,
+    user_id: int,
+    dedupe: bool = False,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """
+    Stream a contacts CSV into a campaign chunk by chunk, rejecting invalid
+    rows. With dedupe, numbers that do not normalize are rejected and rows
+    whose phone number is already in one of the user's active campaigns (this
+    one included) are skipped. progress, if given, is called after each
+    chunk. The caller commits.
+    """
+    report = ImportReport()
+    for chunk in read_csv_chunks(file_obj, CONTACT_REQUIRED_FIELDS, chunk_size):
+        rows = []
+        for line, raw in chunk:
+            report.rows_read += 1
+            try:
+                row = parse_contact_row(raw, require_valid_phone=dedupe)
+            except ValueError as e:
+                report.reject(line, e)
+                continue
+            row.update(campaign_id=campaign_id, user_id=user_id, status="pending")
+            rows.append(row)
+        load_contact_rows(db, user_id, rows, dedupe, report)
+        if progress is not None:
+            progress(report)
+    return report.finish()
+
+
+def _provided(field: str, value) -> bool:
+    # Blank cells and support level 0 (unknown) mean "no data", not "clear it"
+    return value not in (None, "") and not (field == "support_level" and value == 0)
+
+
+def _existing_voters(db: Session, user_id: int, match_keys: Iterable[str]) -> Dict[str, List[dict]]:
+    """The user's voters with any of these match keys, grouped by key (indexed lookups)."""
+    match_keys = list(match_keys)
+    table = Voter.__table__
+    columns = [table.c.id, table.c.match_key, table.c.latitude, table.c.longitude, table.c.geocoded_at]
+    columns += [table.c[field] for field in VOTER_UPSERT_FIELDS]
+    found: Dict[str, List[dict]] = {}
+    for start in range(0, len(match_keys), LOOKUP_CHUNK_SIZE):
+        rows = db.execute(select(*columns).where(
+            table.c.user_id == user_id,
+            table.c.match_key.in_(match_keys[start:start + LOOKUP_CHUNK_SIZE])
+        )).mappings()
+        for row in rows:
+            found.setdefault(row["match_key"], []).append(dict(row))
+    return found
+
+
+def upsert_voters(db: Session, user_id: int, rows: List[dict], report: ImportReport) -> List[dict]:
+    """
+    Match parsed voter rows against the user's voter file by match key and
+    update the voters whose fields changed, with one lookup per
+    LOOKUP_CHUNK_SIZE keys and one executemany UPDATE. A row with an external
+    id also matches a voter on file without one by name and address. Empty
+    values and support level 0 (unknown) never overwrite what is on file.
+    Voters who moved lose their coordinates and turf memberships
+    so the geocoding sweep redoes them. Returns the rows that matched nothing,
+    for the caller to insert; the caller commits.
+    """
+    # Within one chunk the last row for a key wins
+    latest = {}
+    for row in rows:
+        if row["match_key"] in latest:
+            report.rows_duplicate += 1
+        latest[row["match_key"]] = row
+    name_keys = {
+        key: voter_match_key(row["first_name"], row["last_name"], row["address"])
+        for key, row in latest.items() if row["external_id"]
+    }
+    existing = _existing_voters(db, user_id, set(latest) | set(name_keys.values()))
+
+    new_rows, updates, moved = [], [], []
+    for key, row in latest.items():
+        matches = existing.get(key)
+        if not matches and key in name_keys:
+            matches = [voter for voter in existing.get(name_keys[key], []) if not voter["external_id"]]
+        if not matches:
+            new_rows.append(row)
+            continue
+        for voter in matches:
+            values = {field: row[field] if _provided(field, row[field]) else voter[field] for field in VOTER_UPSERT_FIELDS}
+            if all(values[field] == voter[field] for field in VOTER_UPSERT_FIELDS):
+                report.rows_duplicate += 1
+                continue
+            # Respelling the same address keeps its coordinates
+            address_changed = normalize_address(values["address"]) != normalize_address(voter["address"])
+            if address_changed:
+                moved.append(voter["id"])
+            updates.append({
+                "b_id": voter["id"],
+                **{f"b_{field}": value for field, value in values.items()},
+                "b_match_key": voter_match_key(values["first_name"], values["last_name"], values["address"], values["external_id"]),
+                "b_latitude": None if address_changed else voter["latitude"],
+                "b_longitude": None if address_changed else voter["longitude"],
+                "b_geocoded_at": None if address_changed else voter["geocoded_at"],
+            })
+            report.rows_updated += 1
+
+    if updates:
+        table = Voter.__table__
+        fields = VOTER_UPSERT_FIELDS + ("match_key", "latitude", "longitude", "geocoded_at")
+        db.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values({field: bindparam(f"b_{field}") for field in fields}),
+            updates
+        )
+    if moved:
+        remove_voter_memberships(db, moved)
+    return new_rows
+
+
+def load_voter_rows(db: Session, user_id: int, rows: List[dict], update_existing: bool, report: ImportReport) -> int:
+    """
+    Load one chunk of parsed voter rows, upserting them with update_existing.
+    Returns the number of voters inserted, for the caller to count once it commits.
+    """
+    if update_existing and rows:
+        rows = upsert_voters(db, user_id, rows, report)
+    load_rows(db, Voter.__table__, rows)
+    return len(rows)
+
+
+def import_voters(
+    db: Session,
+    file_obj: IO[bytes],
+    user_id: int,
+    resume_from: int = 0,
+    update_existing: bool = False,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """
+    Stream a voters CSV into the user's voter file, committing after every
+    chunk so a failure only loses the chunk in flight. With update_existing,
+    rows matching a voter already on file update it instead of adding a
+    duplicate (see upsert_voters). The first resume_from data rows are
+    skipped, so a failed import can be restarted from
+    report.last_committed_row, which ImportInterrupted carries on failure.
+    progress, if given, is called after each commit.
+    """
+    report = ImportReport()
+    row_number = 0
+    try:
+        for chunk in read_csv_chunks(file_obj, VOTER_REQUIRED_FIELDS, chunk_size):
+            rows = []
+            for line, raw in chunk:
+                row_number += 1
+                if row_number <= resume_from:
+                    continue
+                report.rows_read += 1
+                try:
+                    row = parse_voter_row(raw)
+                except ValueError as e:
+                    report.reject(line, e)
+                    continue
+                if row is not None:
+                    row["user_id"] = user_id
+                    rows.append(row)
+            loaded = load_voter_rows(db, user_id, rows, update_existing, report)
+            db.commit()
+            report.rows_loaded += loaded
+            report.last_committed_row = row_number
+            if progress is not None:
+                progress(report)
+    except Exception as e:
+        db.rollback()
+        raise ImportInterrupted(report.finish(), e) from e
+    return report.finish()
+
+
+def import_donors(
+    db: Session,
+    file_obj: IO[bytes],
+    user_id: int,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """
+    Stream a donors CSV in, one multi-row INSERT ... ON CONFLICT DO NOTHING
+    and one commit per chunk. Emails already on file, or repeated within the
+    upload, count as duplicates rather than failing the import.
+    """
+    report = ImportReport()
+    row_number = 0
+    try:
+        for chunk in read_csv_chunks(file_obj, DONOR_REQUIRED_FIELDS, chunk_size):
+            rows = {}
+            for line, raw in chunk:
+                row_number += 1
+                report.rows_read += 1
+                try:
+                    row = parse_donor_row(raw)
+                except ValueError as e:
+                    report.reject(line, e)
+                    continue
+                if row["email"] in rows:
+                    report.rows_duplicate += 1
+                    continue
+                row.update(user_id=user_id, amount_donated=0.0)
+                rows[row["email"]] = row
+            if rows:
+                statement = dialect_insert(db, Donor.__table__).values(list(rows.values()))
+                inserted = db.execute(statement.on_conflict_do_nothing(index_elements=["email"])).rowcount
+                report.rows_loaded += inserted
+                report.rows_duplicate += len(rows) - inserted
+            db.commit()
+            report.last_committed_row = row_number
+            if progress is not None:
+                progress(report)
+    except Exception as e:
+        db.rollback()
+        raise ImportInterrupted(report.finish(), e) from e
+    return report.finish()
+
+
+def add_voter_contacts(
+    db: Session,
+    campaign_id: int,
+    user_id: int,
+    min_support_level: Optional[int] = None,
+    address_filter: Optional[str] = None,
+    dedupe: bool = False,
+) -> int:
+    """
+    Copy the user's voters that have a phone number into a campaign with one
+    INSERT ... SELECT, filters applied in the database. With dedupe, only
+    voters whose number normalizes are taken, the first voter per phone
+    number, and numbers already in one of the user's active campaigns are
+    skipped. Returns the number of contacts created. The caller commits.
+    """
+    additional_info = (
+        literal("Address: ") + func.coalesce(Voter.address, "")
+        + literal(", Support Level: ") + func.coalesce(cast(Voter.support_level, String), "")
+    )
+    voters = select(
+        literal(campaign_id),
+        Voter.first_name,
+        Voter.last_name,
+        Voter.phone,
+        Voter.phone_key,
+        additional_info,
+        Voter.support_level,
+        literal("pending"),
+        literal(user_id)
+    )
+    filters = [Voter.user_id == user_id]
+    # Deduplication works on the normalized key; otherwise any number on file is dialed as written
+    filters.append(Voter.phone_key.isnot(None) if dedupe else func.coalesce(Voter.phone, "") != "")
+    if min_support_level is not None:
+        filters.append(Voter.support_level >= min_support_level)
+    if address_filter:
+        filters.append(Voter.address.ilike(f"%{address_filter}%"))
+    voters = voters.where(*filters)
+    if dedupe:
+        first_per_phone = select(func.min(Voter.id)).where(*filters).group_by(Voter.phone_key)
+        already_called = exists().where(
+            PhoneContact.phone_key == Voter.phone_key,
+            PhoneContact.campaign_id == PhoneBankingCampaign.id,
+            PhoneBankingCampaign.user_id == user_id,
+            PhoneBankingCampaign.active.is_(True)
+        )
+        voters = voters.where(Voter.id.in_(first_per_phone), ~already_called)
+
+    table = PhoneContact.__table__
+    statement = insert(table).from_select(
+        ["campaign_id", "first_name", "last_name", "phone_number", "phone_key", "additional_info", "support_level", "status", "user_id"],
+        voters
+    )
+    return db.execute(statement).rowcount
@@ -0,0 +1,132 @@
+# backend/live_stats.py
+import asyncio
+import json
+import threading
+from collections import Counter
+from typing import Dict, Optional, Set
+
+from config import LIVE_STATS_INTERVAL_SECONDS, REDIS_URL
+
+REDIS_CHANNEL = "polistudio:campaign-stats"
+# Messages a slow subscriber may fall behind by before it is told to resync instead
+SUBSCRIBER_QUEUE_SIZE = 100
+DISTRIBUTIONS = {"status": "status_distribution", "support": "support_distribution", "volunteer": "volunteer_stats"}
+
+
+class StatsBroadcaster:
+    """
+    Fans committed campaign stat deltas out to live subscribers. Deltas are
+    accumulated per campaign and sent as one message per campaign every
+    LIVE_STATS_INTERVAL_SECONDS, however many calls were logged in between.
+    With REDIS_URL set, deltas are published to Redis and every API process
+    forwards what it receives to its own subscribers; otherwise delivery is
+    in-process only.
+    """
+
+    def __init__(self, interval: float = LIVE_STATS_INTERVAL_SECONDS, redis_url: Optional[str] = REDIS_URL):
+        self.interval = interval
+        self._pending: Dict[int, Counter] = {}
+        self._resync: Set[int] = set()
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._lock = threading.Lock()
+        self._task = None
+        self._redis = None
+        if redis_url:
+            try:
+                import redis
+            except ImportError:
+                print("REDIS_URL is set but the redis package is not installed; live stats stay in-process")
+            else:
+                self._redis = redis.Redis.from_url(redis_url)
+                threading.Thread(target=self._listen, name="live-stats-redis", daemon=True).start()
+
+    def publish(self, deltas: Counter):
+        """Queue committed deltas keyed (campaign_id, dimension, key). Safe to call from any thread."""
+        if self._redis is not None:
+            payload = [[campaign_id, dimension, key, delta] for (campaign_id, dimension, key), delta in deltas.items() if delta]
+            self._redis.publish(REDIS_CHANNEL, json.dumps({"deltas": payload}))
+        else:
+            self._accumulate(deltas)
+
+    def resync(self, campaign_id: int):
+        """
+        Tell a campaign's subscribers to refetch the full stats, e.g. after the
+        counters were rebuilt. If Redis cannot be reached, at least this
+        process's subscribers are told.
+        """
+        if self._redis is not None:
+            try:
+                self._redis.publish(REDIS_CHANNEL, json.dumps({"resync": campaign_id}))
+                return
+            except Exception as e:
+                print(f"Live stats resync for campaign {campaign_id} could not be published: {e}")
+        with self._lock:
+            self._resync.add(campaign_id)
+
+    def _accumulate(self, deltas: Counter):
+        with self._lock:
+            for (campaign_id, dimension, key), delta in deltas.items():
+                if delta and campaign_id in self._subscribers:
+                    self._pending.setdefault(campaign_id, Counter())[(dimension, key)] += delta
+
+    def _listen(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(REDIS_CHANNEL)
+        for message in pubsub.listen():
+            try:
+                data = json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+            if "resync" in data:
+                with self._lock:
+                    self._resync.add(data["resync"])
+            else:
+                self._accumulate(Counter({(campaign_id, dimension, key): delta for campaign_id, dimension, key, delta in data["deltas"]}))
+
+    def subscribe(self, campaign_id: int) -> asyncio.Queue:
+        """Register a subscriber; must be called on the event loop that will consume the queue."""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(campaign_id, set()).add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._broadcast())
+        return queue
+
+    def unsubscribe(self, campaign_id: int, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(campaign_id)
+            if subscribers is None:
+                return
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[campaign_id]
+                self._pending.pop(campaign_id, None)
+
+    async def _broadcast(self):
+        while self._subscribers:
+            await asyncio.sleep(self.interval)
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                resync, self._resync = self._resync, set()
+                subscribers = {campaign_id: list(queues) for campaign_id, queues in self._subscribers.items()}
+            for campaign_id, queues in subscribers.items():
+                if campaign_id in resync:
+                    message = {"campaign_id": campaign_id, "resync": True}
+                elif pending.get(campaign_id):
+                    message = {"campaign_id": campaign_id, **{name: {} for name in DISTRIBUTIONS.values()}}
+                    for (dimension, key), delta in pending[campaign_id].items():
+                        if delta:
+                            message[DISTRIBUTIONS[dimension]][key] = delta
+                else:
+                    continue
+                for queue in queues:
+                    try:
+                        queue.put_nowait(message)
+                    except asyncio.QueueFull:
+                        # Too far behind to apply deltas; drop the backlog and have it refetch
+                        while not queue.empty():
+                            queue.get_nowait()
+                        queue.put_nowait({"campaign_id": campaign_id, "resync": True})
+
+
+stats_broadcaster = StatsBroadcaster()
@@ -3,6 +3,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from database import engine
 from models import Base
+from geocoding import geocoding_pipeline
+from dialer import dial_queues
+from import_jobs import import_jobs
+from parallel_csv import parse_pool
 from routers import voter, import_data, ai_router, volunteer, phone_banking, donors, donations, door_knocking, events, auth
 
 app = FastAPI(title="PoliStudio API")
@@ -31,6 +35,33 @@ app.include_router(door_knocking.router, prefix="/door-knocking", tags=["door-kn
 app.include_router(events.router, prefix="/events", tags=["events"])
 app.include_router(auth.router)
 
+@app.on_event("startup")
+def start_geocoding_pipeline():
+    # Pick up voters that were loaded while the pipeline was not running
+    geocoding_pipeline.sweep()
+
+@app.on_event("startup")
+def start_parse_pool():
+    # Start the forkserver before request threads exist; imports share its workers
+    parse_pool.start()
+
+@app.on_event("shutdown")
+def stop_geocoding_pipeline():
+    geocoding_pipeline.stop(timeout=5)
+
+@app.on_event("shutdown")
+def stop_dial_queues():
+    # Write back call outcomes still buffered in memory
+    dial_queues.stop(timeout=5)
+
+@app.on_event("shutdown")
+def stop_import_jobs():
+    import_jobs.shutdown()
+
+@app.on_event("shutdown")
+def stop_parse_pool():
+    parse_pool.stop()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to PoliStudio API"}
\ No newline at end of file
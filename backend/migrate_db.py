@@ -1,3 +1,4 @@
+import datetime
 import os
 import sys
 from sqlalchemy import create_engine
@@ -16,6 +17,97 @@ def column_exists(db, table, column):
     )
     return result.first() is not None
 
+# Columns added to existing tables after the initial schema: (table, column, column definition)
+ADDED_COLUMNS = [
+    ("voters", "latitude", "DOUBLE PRECISION"),
+    ("voters", "longitude", "DOUBLE PRECISION"),
+    ("voters", "geocoded_at", "TIMESTAMP"),
+    ("turfs", "min_lat", "DOUBLE PRECISION"),
+    ("turfs", "min_lng", "DOUBLE PRECISION"),
+    ("turfs", "max_lat", "DOUBLE PRECISION"),
+    ("turfs", "max_lng", "DOUBLE PRECISION"),
+    ("turfs", "membership_updated_at", "TIMESTAMP"),
+    ("turfs", "membership_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("phone_contacts", "claim_expires_at", "TIMESTAMP"),
+    ("phone_banking_campaigns", "stats_reconciled_at", "TIMESTAMP"),
+    ("voters", "phone_key", "VARCHAR"),
+    ("phone_contacts", "phone_key", "VARCHAR"),
+    ("voters", "external_id", "VARCHAR"),
+    ("voters", "match_key", "VARCHAR(40)"),
+]
+
+# Indexes on existing tables that create_all() will not add
+ADDED_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_voters_lat_lng ON voters (latitude, longitude)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_canvassing_logs_voter_turf ON canvassing_logs (voter_id, turf_id)",
+    "CREATE INDEX IF NOT EXISTS ix_phone_contacts_campaign_status ON phone_contacts (campaign_id, status)",
+    "CREATE INDEX IF NOT EXISTS ix_voters_phone_key ON voters (phone_key)",
+    "CREATE INDEX IF NOT EXISTS ix_phone_contacts_phone_key ON phone_contacts (phone_key)",
+    "CREATE INDEX IF NOT EXISTS ix_voters_user_match_key ON voters (user_id, match_key)",
+]
+
+def dedupe_canvassing_logs(db):
+    # The unique (voter_id, turf_id) index needs duplicates gone first; keep the newest log of each pair
+    result = db.execute(text("""
+        DELETE FROM canvassing_logs a
+        USING canvassing_logs b
+        WHERE a.voter_id = b.voter_id AND a.turf_id = b.turf_id AND a.id < b.id
+    """))
+    db.commit()
+    print(f"Removed {result.rowcount} duplicate canvassing logs")
+
+def backfill_turf_bounds(db):
+    from spatial import parse_boundary, polygon_bbox
+    turfs = db.execute(text("SELECT id, boundary FROM turfs WHERE min_lat IS NULL")).fetchall()
+    for turf_id, boundary in turfs:
+        try:
+            min_lat, min_lng, max_lat, max_lng = polygon_bbox(parse_boundary(boundary))
+        except ValueError:
+            print(f"Turf {turf_id} has an invalid boundary. Skipping bounds backfill.")
+            continue
+        db.execute(
+            text("UPDATE turfs SET min_lat = :min_lat, min_lng = :min_lng, max_lat = :max_lat, max_lng = :max_lng WHERE id = :id"),
+            {"min_lat": min_lat, "min_lng": min_lng, "max_lat": max_lat, "max_lng": max_lng, "id": turf_id}
+        )
+    db.commit()
+    print(f"Backfilled bounds for {len(turfs)} turfs")
+
+def backfill_phone_keys(db, table, column, batch_size=5000):
+    from phone_numbers import normalize_phone
+    rows = db.execute(text(f"SELECT id, {column} FROM {table} WHERE phone_key IS NULL AND {column} IS NOT NULL")).fetchall()
+    params = [{"id": row_id, "phone_key": normalize_phone(phone)} for row_id, phone in rows]
+    params = [param for param in params if param["phone_key"]]
+    for start in range(0, len(params), batch_size):
+        db.execute(text(f"UPDATE {table} SET phone_key = :phone_key WHERE id = :id"), params[start:start + batch_size])
+    db.commit()
+    print(f"Backfilled phone keys for {len(params)} of {len(rows)} {table} rows")
+
+def backfill_voter_match_keys(db, batch_size=5000):
+    # Every key is recomputed, not only missing ones: keys change whenever address normalization does
+    from voter_matching import voter_match_key
+    rows = db.execute(text("SELECT id, first_name, last_name, address, external_id, match_key FROM voters")).fetchall()
+    params = [
+        {"id": row_id, "match_key": voter_match_key(first_name, last_name, address, external_id)}
+        for row_id, first_name, last_name, address, external_id, match_key in rows
+    ]
+    params = [param for param, row in zip(params, rows) if param["match_key"] != row.match_key]
+    for start in range(0, len(params), batch_size):
+        db.execute(text("UPDATE voters SET match_key = :match_key WHERE id = :id"), params[start:start + batch_size])
+    db.commit()
+    print(f"Backfilled match keys for {len(params)} of {len(rows)} voters")
+
+def backfill_contact_claims(db):
+    # Contacts claimed before leases existed have a volunteer but no expiry, which the dialer reads as unclaimed;
+    # give each uncalled one a fresh lease so its volunteer keeps it for one PHONE_CLAIM_TTL_MINUTES
+    from config import PHONE_CLAIM_TTL_MINUTES
+    expires = datetime.datetime.utcnow() + datetime.timedelta(minutes=PHONE_CLAIM_TTL_MINUTES)
+    result = db.execute(text("""
+        UPDATE phone_contacts SET claim_expires_at = :expires
+        WHERE volunteer_id IS NOT NULL AND claim_expires_at IS NULL AND (status IS NULL OR status = 'pending')
+    """), {"expires": expires})
+    db.commit()
+    print(f"Backfilled claim expiry for {result.rowcount} claimed phone contacts")
+
 def run_migration():
     # Connect to the database
     engine = create_engine(DATABASE_URL)
@@ -105,6 +197,37 @@ def run_migration():
                 print(f"Could not add foreign key constraint for {table}. It may already exist. Error: {e}")
         
         db.commit()
+
+        for table, column, definition in ADDED_COLUMNS:
+            if not engine.dialect.has_table(engine.connect(), table):
+                continue
+            if not column_exists(db, table, column):
+                print(f"Adding {column} column to {table}...")
+                db.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {definition}'))
+                db.commit()
+            else:
+                print(f"{column} column already exists in {table}. Skipping add.")
+
+        if engine.dialect.has_table(engine.connect(), "canvassing_logs"):
+            dedupe_canvassing_logs(db)
+
+        for statement in ADDED_INDEXES:
+            db.execute(text(statement))
+        db.commit()
+
+        if engine.dialect.has_table(engine.connect(), "turfs"):
+            backfill_turf_bounds(db)
+
+        for table, column in (("voters", "phone"), ("phone_contacts", "phone_number")):
+            if engine.dialect.has_table(engine.connect(), table):
+                backfill_phone_keys(db, table, column)
+
+        if engine.dialect.has_table(engine.connect(), "voters"):
+            backfill_voter_match_keys(db)
+
+        if engine.dialect.has_table(engine.connect(), "phone_contacts"):
+            backfill_contact_claims(db)
+
         print("Migration completed successfully!")
         
     except Exception as e:
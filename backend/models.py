@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text, JSON, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import datetime
@@ -36,12 +36,25 @@ class Voter(Base):
     address = Column(String, index=True)
     support_level = Column(Integer, default=0)  # e.g. 0 (unknown) to 5 (strong support)
     phone = Column(String, nullable=True)  # Add phone number field
+    phone_key = Column(String, nullable=True, index=True)  # E.164 form of phone, for matching and deduplication
     email = Column(String, nullable=True)  # Optional: add email for additional contact info
+    external_id = Column(String, nullable=True)  # Voter id from the source voter file, when it has one
+    match_key = Column(String(40), nullable=True)  # Hash of the normalized identity, see voter_matching.py
+    latitude = Column(Float, nullable=True)  # Filled in by the background geocoding pipeline
+    longitude = Column(Float, nullable=True)
+    geocoded_at = Column(DateTime, nullable=True)  # NULL until geocoded; reset when the address changes
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="voters")
 
+    __table_args__ = (
+        # Serves turf bounding-box prefilters
+        Index("ix_voters_lat_lng", "latitude", "longitude"),
+        # Serves re-import matching
+        Index("ix_voters_user_match_key", "user_id", "match_key"),
+    )
+
 class Donor(Base):
     __tablename__ = "donors"
     
@@ -83,11 +96,20 @@ class PhoneBankingCampaign(Base):
     calls_per_volunteer = Column(Integer, default=10)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     active = Column(Boolean, default=True)
+    stats_reconciled_at = Column(DateTime, nullable=True)  # last full rebuild of campaign_stat_counters; NULL = never built
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="phone_banking_campaigns")
 
+class CampaignStatCounter(Base):
+    """Incrementally maintained campaign statistics: one count per (dimension, key), e.g. ("status", "completed")."""
+    __tablename__ = "campaign_stat_counters"
+    campaign_id = Column(Integer, ForeignKey("phone_banking_campaigns.id", ondelete="CASCADE"), primary_key=True)
+    dimension = Column(String, primary_key=True)  # status, support or volunteer
+    key = Column(String, primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
 class PhoneContact(Base):
     __tablename__ = "phone_contacts"
     
@@ -96,17 +118,24 @@ class PhoneContact(Base):
     first_name = Column(String)
     last_name = Column(String)
     phone_number = Column(String)
+    phone_key = Column(String, nullable=True, index=True)  # E.164 form of phone_number, for deduplication
     additional_info = Column(String, nullable=True)
     status = Column(String, default="pending")  # pending, completed, no_answer, wrong_number, call_back, refused
     support_level = Column(Integer, nullable=True)
     notes = Column(String, nullable=True)
     last_called = Column(DateTime, nullable=True)
     volunteer_id = Column(Integer, ForeignKey("volunteers.id"), nullable=True)
+    claim_expires_at = Column(DateTime, nullable=True)  # pending contacts become claimable again after this
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     # Relationships
     user = relationship("User", back_populates="phone_contacts")
 
+    __table_args__ = (
+        # Serves the contact claim scan
+        Index("ix_phone_contacts_campaign_status", "campaign_id", "status"),
+    )
+
 # ===== Door Knocking Models =====
 
 class Turf(Base):
@@ -114,6 +143,13 @@ class Turf(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     boundary = Column(Text)  # JSON string representing polygon coordinates
+    # Bounding box of the boundary, used to prefilter voters before the point-in-polygon test
+    min_lat = Column(Float, nullable=True)
+    min_lng = Column(Float, nullable=True)
+    max_lat = Column(Float, nullable=True)
+    max_lng = Column(Float, nullable=True)
+    membership_updated_at = Column(DateTime, nullable=True)  # last rebuild of turf_voters for this turf; NULL = never built
+    membership_version = Column(Integer, default=0, nullable=False)  # bumped whenever turf_voters rows for this turf change
     assigned_to = Column(Integer, ForeignKey("volunteers.id"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
@@ -137,6 +173,41 @@ class CanvassingLog(Base):
     voter = relationship("Voter")
     turf = relationship("Turf", back_populates="canvassing_logs")
 
+    __table_args__ = (
+        # One log per voter per turf; offline sync upserts against it
+        UniqueConstraint("voter_id", "turf_id", name="uq_canvassing_logs_voter_turf"),
+    )
+
+class TurfVoter(Base):
+    """Materialized membership: which voters fall inside which turf's boundary."""
+    __tablename__ = "turf_voters"
+    turf_id = Column(Integer, ForeignKey("turfs.id", ondelete="CASCADE"), primary_key=True)
+    voter_id = Column(Integer, ForeignKey("voters.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+class GeocodeCache(Base):
+    __tablename__ = "geocode_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    address_key = Column(String, unique=True, index=True, nullable=False)  # normalized address used for lookups
+    query = Column(String)  # address string actually sent to the geocoder
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    found = Column(Boolean, default=True)  # False caches "address not found" so it is not retried every request
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+class ImportJob(Base):
+    """A CSV import running in the background; report is refreshed as each chunk lands."""
+    __tablename__ = "import_jobs"
+    id = Column(String, primary_key=True)  # uuid4 hex
+    kind = Column(String, nullable=False)  # voters, donors or contacts
+    status = Column(String, default="queued", nullable=False)  # queued, running, succeeded, failed
+    filename = Column(String, nullable=True)
+    report = Column(JSON, nullable=True)  # ImportReport.to_dict()
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
 class Event(Base):
     __tablename__ = "events"
     id = Column(Integer, primary_key=True, index=True)
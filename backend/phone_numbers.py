@@ -0,0 +1,63 @@
+# backend/phone_numbers.py
+import re
+from typing import Optional
+
+import pandas as pd
+
+from config import PHONE_DEFAULT_COUNTRY_CODE
+
+# Everything from an extension marker on is dropped: "612-555-0100 ext. 4" dials the same line
+# Inline flag rather than re.IGNORECASE so pandas can hand the pattern to Arrow as is
+_EXTENSION = re.compile(r"(?i)(?:ext\.?|extension|x|#).*$")
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(raw: Optional[str], country_code: str = PHONE_DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """
+    Canonical E.164 key ("+16125550100") for a free-form phone number, or None
+    when it cannot be a dialable number. Numbers without a "+" or "00" prefix
+    are read as national numbers in the default country; for the NANP default
+    (country code 1) that means 10 digits, optionally preceded by a 1.
+    """
+    if not raw:
+        return None
+    number = _EXTENSION.sub("", raw.strip())
+    international = number.startswith("+") or number.startswith("00")
+    digits = _NON_DIGITS.sub("", number)
+    if international:
+        digits = digits[2:] if number.startswith("00") else digits
+    elif country_code == "1":
+        if len(digits) == 11 and digits.startswith("1"):
+            digits = digits[1:]
+        if len(digits) != 10:
+            return None
+        digits = country_code + digits
+    else:
+        digits = country_code + digits.lstrip("0")
+    # E.164 allows at most 15 digits; anything under 8 is too short to be a full number
+    if not 8 <= len(digits) <= 15 or digits.startswith("0"):
+        return None
+    return "+" + digits
+
+
+def normalize_phones(values: pd.Series, country_code: str = PHONE_DEFAULT_COUNTRY_CODE) -> pd.Series:
+    """
+    normalize_phone over a whole column with vectorized string operations;
+    invalid numbers become None. Arrow-backed string columns keep their dtype,
+    which runs the string operations in Arrow rather than per element.
+    """
+    if not isinstance(values.dtype, pd.StringDtype):
+        values = values.astype("string")
+    numbers = values.fillna("").str.strip().str.replace(_EXTENSION.pattern, "", regex=True)
+    double_zero = numbers.str.startswith("00")
+    international = numbers.str.startswith("+") | double_zero
+    digits = numbers.str.replace(_NON_DIGITS.pattern, "", regex=True)
+    digits = digits.mask(double_zero, digits.str[2:])
+    if country_code == "1":
+        national = digits.mask((digits.str.len() == 11) & digits.str.startswith("1"), digits.str[1:])
+        national = (country_code + national).where(national.str.len() == 10, "")
+    else:
+        national = country_code + digits.str.lstrip("0")
+    digits = digits.where(international, national)
+    valid = digits.str.len().between(8, 15) & ~digits.str.startswith("0")
+    return ("+" + digits).astype(object).where(valid, None)
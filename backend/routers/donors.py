@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
-import csv, io
+from starlette.concurrency import run_in_threadpool
 from models import Donor, User
 from schemas import DonorCreate, DonorRead
 from database import get_db
 from auth import get_current_user
+from csv_rows import CsvImportError
+from importers import ImportInterrupted, import_donors
+from import_jobs import import_jobs
 
 router = APIRouter(tags=["donors"])
 
@@ -55,24 +58,18 @@ def delete_donor(donor_id: int, db: Session = Depends(get_db), current_user: Use
     return {"message": "Donor deleted successfully"}
 
 @router.post("/import")
-async def import_donors_csv(file: UploadFile = File(...), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def import_donors_csv(file: UploadFile = File(...), background: bool = False, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
-    content = await file.read()
-    decoded = content.decode("utf-8")
-    reader = csv.DictReader(io.StringIO(decoded))
-    imported_count = 0
-    for row in reader:
-        if "name" not in row or "email" not in row:
-            raise HTTPException(status_code=400, detail="CSV must have name and email columns")
-        donor = Donor(
-            name=row["name"].strip(),
-            email=row["email"].strip(),
-            phone=row.get("phone", "").strip(),
-            address=row.get("address", "").strip() if row.get("address") else None,
+    if background:
+        job_id = await run_in_threadpool(
+            import_jobs.submit, "donors", current_user.id, file.file, file.filename, import_donors,
             user_id=current_user.id
         )
-        db.add(donor)
-        imported_count += 1
-    db.commit()
-    return {"status": "success", "imported_count": imported_count} 
\ No newline at end of file
+        return {"status": "queued", "job_id": job_id}
+    try:
+        report = await run_in_threadpool(import_donors, db, file.file, current_user.id)
+    except ImportInterrupted as e:
+        status_code = 400 if isinstance(e.error, CsvImportError) else 500
+        raise HTTPException(status_code=status_code, detail={"error": str(e), "report": e.report.to_dict()})
+    return {"status": "success", "imported_count": report.rows_loaded, **report.to_dict()}
@@ -1,45 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Form, Body
+from fastapi import APIRouter, Depends, HTTPException, Form, Body, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func, tuple_
+from typing import List, Optional
+import datetime
 import json
-from models import Turf, CanvassingLog, Voter, Volunteer
-from schemas import TurfCreate, TurfRead, CanvassingLogCreate, CanvassingLogRead
-from database import get_db
-from geopy.geocoders import Nominatim
-
-geolocator = Nominatim(user_agent="polistudio")
+import time
+from models import Turf, TurfVoter, CanvassingLog, Voter, Volunteer, User
+from schemas import TurfCreate, TurfRead, TurfCutRequest, TurfCutResult, CanvassingLogCreate, CanvassingLogRead, CanvassingSyncRequest, CanvassingSyncResponse
+from database import get_db, dialect_insert
+from auth import get_current_user
+from geocoding import get_cache_stats, geocoding_pipeline
+from spatial import parse_boundary, set_turf_bbox
+from turf_membership import rebuild_all_turf_memberships, rebuild_turf_membership
+from walk_order import get_walk_list, build_walk_lists, walk_list_cache
+from turf_cutting import cut_turfs
 
 router = APIRouter()
 
-def get_random_coordinate(address: str) -> (float, float):
-    # Ensure the address is in Minneapolis, MN by appending it if not already present.
-    if "Minneapolis" not in address:
-        address = f"{address}, Minneapolis, MN"
-    
-    location = geolocator.geocode(address)
-    if location:
-        print(f"Debug: Coordinates for address '{address}' are {location.latitude}, {location.longitude}")
-        return location.latitude, location.longitude
-    else:
-        raise HTTPException(status_code=400, detail=f"Address '{address}' not found")
-
-def point_in_polygon(lat: float, lng: float, poly: List[List[float]]) -> bool:
-    # Treat longitude as x and latitude as y.
-    x = lng
-    y = lat
-    inside = False
-    n = len(poly)
-    p1 = poly[0]
-    x1, y1 = p1[1], p1[0]  # p1[1]=lng, p1[0]=lat
-    for i in range(1, n + 1):
-        p2 = poly[i % n]
-        x2, y2 = p2[1], p2[0]
-        if (y1 > y) != (y2 > y):
-            x_intersect = (x2 - x1) * (y - y1) / (y2 - y1 + 1e-10) + x1
-            if x < x_intersect:
-                inside = not inside
-        x1, y1 = x2, y2
-    return inside
+# Rows per multi-row INSERT ... ON CONFLICT statement during offline sync
+SYNC_CHUNK_SIZE = 500
+# Rows fetched per cursor round-trip and features per streamed chunk for GeoJSON feeds
+GEOJSON_CHUNK_SIZE = 500
 
 @router.get("/turf", response_model=List[TurfRead])
 def get_all_turfs(db: Session = Depends(get_db)):
@@ -48,58 +30,226 @@ def get_all_turfs(db: Session = Depends(get_db)):
 
 @router.post("/turf", response_model=TurfRead)
 def create_turf(turf: TurfCreate, db: Session = Depends(get_db)):
+    try:
+        polygon = parse_boundary(turf.boundary)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid turf boundary data")
     new_turf = Turf(**turf.dict())
+    set_turf_bbox(new_turf, polygon)
     db.add(new_turf)
+    db.flush()
+    rebuild_turf_membership(db, new_turf)
     db.commit()
     db.refresh(new_turf)
     return new_turf
 
-@router.get("/turf/{turf_id}/voters", response_model=List[dict])
-def get_turf_voters(turf_id: int, db: Session = Depends(get_db), public: bool = False):
+@router.post("/turf/cut", response_model=List[TurfCutResult])
+def cut_turfs_from_voters(request: TurfCutRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Partition the current user's (optionally filtered) geocoded voters into compact turfs of similar door counts."""
+    if request.n_turfs < 1:
+        raise HTTPException(status_code=400, detail="n_turfs must be at least 1")
+    created = cut_turfs(
+        db,
+        current_user.id,
+        request.n_turfs,
+        name_prefix=request.name_prefix,
+        min_support_level=request.min_support_level,
+        max_support_level=request.max_support_level,
+        address_filter=request.address_filter
+    )
+    db.commit()
+    return [{
+        "id": item["turf"].id,
+        "name": item["turf"].name,
+        "boundary": item["turf"].boundary,
+        "assigned_to": item["turf"].assigned_to,
+        "door_count": item["door_count"],
+        "voter_count": item["voter_count"]
+    } for item in created]
+
+def _load_turf_with_members(db: Session, turf_id: int) -> Turf:
     turf = db.query(Turf).filter(Turf.id == turf_id).first()
     if not turf:
         raise HTTPException(status_code=404, detail="Turf not found")
     try:
         # Parse the boundary JSON string into a list of [lat, lng] pairs
-        turf_boundary = json.loads(turf.boundary)
-    except Exception as e:
+        parse_boundary(turf.boundary)
+    except ValueError:
         raise HTTPException(status_code=400, detail="Invalid turf boundary data")
-    # Fetch all voters and filter them using real coordinates via Geopy
-    voters_all = db.query(Voter).all()
+    if turf.membership_updated_at is None:
+        # Turfs saved before turf_voters existed are materialized on first read
+        rebuild_turf_membership(db, turf)
+        db.commit()
+    return turf
+
+def _turf_members_query(db: Session, turf_id: int, *entities):
+    """Turf members with their latest canvassing log id and result appended to `entities`."""
+    # Latest canvassing log per voter in this turf, joined in so status costs no extra round-trips
+    latest_log = db.query(
+        CanvassingLog.voter_id,
+        func.max(CanvassingLog.id).label("log_id")
+    ).filter(
+        CanvassingLog.turf_id == turf_id
+    ).group_by(CanvassingLog.voter_id).subquery()
+    # Membership is maintained on turf creation and voter geocoding, so this is an indexed join
+    return db.query(*entities, latest_log.c.log_id, CanvassingLog.result).select_from(TurfVoter).join(
+        Voter, Voter.id == TurfVoter.voter_id
+    ).outerjoin(
+        latest_log, latest_log.c.voter_id == TurfVoter.voter_id
+    ).outerjoin(
+        CanvassingLog, CanvassingLog.id == latest_log.c.log_id
+    ).filter(TurfVoter.turf_id == turf_id)
+
+@router.get("/turf/{turf_id}/voters", response_model=List[dict])
+def get_turf_voters(turf_id: int, db: Session = Depends(get_db), public: bool = False):
+    turf = _load_turf_with_members(db, turf_id)
+    members = _turf_members_query(db, turf_id, Voter).all()
     filtered_voters = []
-    for voter in voters_all:
-        if not voter.address:
-            continue
-        lat, lng = get_random_coordinate(voter.address)
-        if point_in_polygon(lat, lng, turf_boundary):
-            # Check for canvassing logs to determine status
-            status = "pending"
-            support_level = getattr(voter, 'support_level', None)
-            canvassing_log = db.query(CanvassingLog).filter(
-                CanvassingLog.voter_id == voter.id,
-                CanvassingLog.turf_id == turf_id
-            ).first()
-            
-            if canvassing_log:
-                status = "completed"
-                support_level = canvassing_log.result
-            
-            filtered_voters.append({
-                "id": voter.id,
-                "first_name": voter.first_name,
-                "last_name": voter.last_name,
-                "address": voter.address,
-                "lat": lat,
-                "lng": lng,
-                "age": getattr(voter, 'age', None),
-                "party": getattr(voter, 'party', None),
-                "voting_history": getattr(voter, 'voting_history', None),
-                "support_level": support_level,
-                "status": status,
-                "turf_name": turf.name
-            })
+    for voter, log_id, log_result in members:
+        lat, lng = voter.latitude, voter.longitude
+        # Voters with a canvassing log in this turf are done
+        status = "pending"
+        support_level = getattr(voter, 'support_level', None)
+        
+        if log_id is not None:
+            status = "completed"
+            support_level = log_result
+        
+        filtered_voters.append({
+            "id": voter.id,
+            "first_name": voter.first_name,
+            "last_name": voter.last_name,
+            "address": voter.address,
+            "lat": lat,
+            "lng": lng,
+            "age": getattr(voter, 'age', None),
+            "party": getattr(voter, 'party', None),
+            "voting_history": getattr(voter, 'voting_history', None),
+            "support_level": support_level,
+            "status": status,
+            "turf_name": turf.name
+        })
     return filtered_voters
 
+@router.get("/turf/{turf_id}/voters/geojson")
+def stream_turf_voters_geojson(
+    turf_id: int,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    compact: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Turf voters as a GeoJSON FeatureCollection streamed from a server-side cursor.
+    Pages are keyed on voter id: pass the returned `next_cursor` as `after_id`.
+    `compact` limits properties to id and status for map clients.
+    """
+    turf = _load_turf_with_members(db, turf_id)
+    columns = (Voter.id, Voter.latitude, Voter.longitude)
+    if not compact:
+        columns += (Voter.first_name, Voter.last_name, Voter.address, Voter.support_level)
+    query = _turf_members_query(db, turf_id, *columns)
+    if after_id is not None:
+        query = query.filter(TurfVoter.voter_id > after_id)
+    query = query.order_by(TurfVoter.voter_id)
+    if limit is not None:
+        query = query.limit(limit + 1)  # one extra row tells us whether another page exists
+    turf_name = turf.name
+
+    def features():
+        yield json.dumps({"type": "FeatureCollection", "turf_id": turf_id, "turf_name": turf_name})[:-1] + ', "features": ['
+        buffer = []
+        emitted = 0
+        last_id = None
+        has_more = False
+        for row in query.yield_per(GEOJSON_CHUNK_SIZE):
+            if limit is not None and emitted == limit:
+                has_more = True
+                break
+            properties = {"id": row.id, "status": "completed" if row.log_id is not None else "pending"}
+            if not compact:
+                properties.update({
+                    "first_name": row.first_name,
+                    "last_name": row.last_name,
+                    "address": row.address,
+                    "support_level": row.result if row.log_id is not None else row.support_level
+                })
+            feature = {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [row.longitude, row.latitude]},
+                "properties": properties
+            }
+            buffer.append(("," if emitted else "") + json.dumps(feature, separators=(",", ":")))
+            emitted += 1
+            last_id = row.id
+            if len(buffer) >= GEOJSON_CHUNK_SIZE:
+                yield "".join(buffer)
+                buffer = []
+        if buffer:
+            yield "".join(buffer)
+        yield '], "next_cursor": ' + json.dumps(last_id if has_more else None) + "}"
+
+    return StreamingResponse(features(), media_type="application/geo+json")
+
+@router.get("/turf/{turf_id}/walk-list")
+def get_turf_walk_list(turf_id: int, db: Session = Depends(get_db)):
+    """Doors in walking order, one stop per address; cached until the turf's membership changes."""
+    turf = db.query(Turf).filter(Turf.id == turf_id).first()
+    if not turf:
+        raise HTTPException(status_code=404, detail="Turf not found")
+    if turf.membership_updated_at is None:
+        rebuild_turf_membership(db, turf)
+        db.commit()
+    return get_walk_list(db, turf)
+
+@router.post("/turf/walk-lists")
+def build_turf_walk_lists(turf_ids: Optional[List[int]] = Body(None), db: Session = Depends(get_db)):
+    """Batch-compute walk lists for the given turfs (all turfs when omitted) and warm the cache."""
+    query = db.query(Turf)
+    if turf_ids is not None:
+        query = query.filter(Turf.id.in_(turf_ids))
+    turfs = query.order_by(Turf.id).all()
+    unbuilt = [turf for turf in turfs if turf.membership_updated_at is None]
+    for turf in unbuilt:
+        rebuild_turf_membership(db, turf)
+    if unbuilt:
+        db.commit()
+    started = time.perf_counter()
+    walk_lists = build_walk_lists(db, turfs)
+    return {
+        "turfs": [{
+            "turf_id": walk_list["turf_id"],
+            "stop_count": walk_list["stop_count"],
+            "voter_count": walk_list["voter_count"],
+            "distance_km": walk_list["distance_km"]
+        } for walk_list in walk_lists],
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+@router.post("/turf/assign-voters")
+def assign_voters_to_turfs(db: Session = Depends(get_db)):
+    """
+    Rebuild turf membership for every turf from the geocoded voters and save
+    it. A voter inside overlapping turfs is a member of each.
+    """
+    turfs = db.query(Turf).order_by(Turf.id).all()
+    counts, assigned, unassigned = rebuild_all_turf_memberships(db)
+    db.commit()
+    return {
+        "turfs": [{"turf_id": turf.id, "turf_name": turf.name, "voter_count": counts.get(turf.id, 0)} for turf in turfs],
+        "assigned": assigned,
+        "unassigned": unassigned
+    }
+
+@router.get("/geocode-cache/stats")
+def get_geocode_cache_stats():
+    return get_cache_stats()
+
+@router.post("/geocode/sweep")
+def sweep_ungeocoded_voters():
+    queued = geocoding_pipeline.sweep()
+    return {"queued": queued}
+
 @router.post("/volunteers/{volunteer_id}/assign-turf", response_model=TurfRead)
 def assign_turf_to_volunteer(volunteer_id: int, turf_id: int = Form(...), db: Session = Depends(get_db)):
     turf = db.query(Turf).filter(Turf.id == turf_id).first()
@@ -113,17 +263,71 @@ def assign_turf_to_volunteer(volunteer_id: int, turf_id: int = Form(...), db: Se
     db.refresh(turf)
     return turf
 
+def get_turf_progress(db: Session, volunteer_ids: Optional[List[int]] = None) -> List[dict]:
+    """
+    Per-turf progress for the turfs assigned to the given volunteers (all assigned
+    turfs when None), computed with grouped queries rather than one COUNT per turf.
+    """
+    turf_filter = Turf.assigned_to.isnot(None) if volunteer_ids is None else Turf.assigned_to.in_(volunteer_ids)
+    turf_ids = db.query(Turf.id).filter(turf_filter)
+    interactions = db.query(
+        CanvassingLog.turf_id,
+        func.count(CanvassingLog.id).label("total_interactions"),
+        func.count(func.distinct(CanvassingLog.voter_id)).label("doors_visited")
+    ).filter(CanvassingLog.turf_id.in_(turf_ids)).group_by(CanvassingLog.turf_id).subquery()
+    sizes = db.query(
+        TurfVoter.turf_id,
+        func.count(TurfVoter.voter_id).label("turf_size")
+    ).filter(TurfVoter.turf_id.in_(turf_ids)).group_by(TurfVoter.turf_id).subquery()
+    rows = db.query(
+        Turf.id,
+        Turf.name,
+        Turf.assigned_to,
+        func.coalesce(interactions.c.total_interactions, 0),
+        func.coalesce(interactions.c.doors_visited, 0),
+        func.coalesce(sizes.c.turf_size, 0)
+    ).outerjoin(
+        interactions, interactions.c.turf_id == Turf.id
+    ).outerjoin(
+        sizes, sizes.c.turf_id == Turf.id
+    ).filter(turf_filter).order_by(Turf.assigned_to, Turf.id).all()
+    return [{
+        "turf_id": turf_id,
+        "turf_name": name,
+        "volunteer_id": assigned_to,
+        "total_interactions": total,
+        "doors_visited": visited,
+        "turf_size": size,
+        "completion_ratio": round(min(visited / size, 1.0), 4) if size else 0.0
+    } for turf_id, name, assigned_to, total, visited, size in rows]
+
+@router.get("/volunteers/progress")
+def get_volunteers_progress(volunteer_ids: Optional[List[int]] = Query(None), db: Session = Depends(get_db)):
+    """Progress board for many volunteers at once; omit volunteer_ids for every volunteer with a turf."""
+    progress = {}
+    for turf in get_turf_progress(db, volunteer_ids):
+        volunteer = progress.setdefault(turf["volunteer_id"], {
+            "volunteer_id": turf["volunteer_id"],
+            "total_interactions": 0,
+            "doors_visited": 0,
+            "turf_size": 0,
+            "turfs": []
+        })
+        volunteer["total_interactions"] += turf["total_interactions"]
+        volunteer["doors_visited"] += turf["doors_visited"]
+        volunteer["turf_size"] += turf["turf_size"]
+        volunteer["turfs"].append(turf)
+    for volunteer in progress.values():
+        size = volunteer["turf_size"]
+        volunteer["completion_ratio"] = round(min(volunteer["doors_visited"] / size, 1.0), 4) if size else 0.0
+    return list(progress.values())
+
 @router.get("/volunteers/{volunteer_id}/progress")
 def get_volunteer_progress(volunteer_id: int, db: Session = Depends(get_db)):
     volunteer = db.query(Volunteer).filter(Volunteer.id == volunteer_id).first()
     if not volunteer:
         raise HTTPException(status_code=404, detail="Volunteer not found")
-    turfs = db.query(Turf).filter(Turf.assigned_to == volunteer_id).all()
-    progress = []
-    for turf in turfs:
-        total = db.query(CanvassingLog).filter(CanvassingLog.turf_id == turf.id).count()
-        progress.append({"turf_id": turf.id, "turf_name": turf.name, "total_interactions": total})
-    return progress
+    return get_turf_progress(db, [volunteer_id])
 
 @router.post("/canvassing-log", response_model=CanvassingLogRead)
 def log_canvassing_interaction(log: CanvassingLogCreate, db: Session = Depends(get_db)):
@@ -160,12 +364,116 @@ def log_canvassing_interaction(log: CanvassingLogCreate, db: Session = Depends(g
         db.refresh(new_log)
         return new_log
 
+def _naive_utc(value: datetime.datetime) -> datetime.datetime:
+    # Log dates are stored as naive UTC; clients usually send an offset ("...Z")
+    if value.tzinfo is not None:
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+@router.post("/canvassing-log/sync", response_model=CanvassingSyncResponse)
+def sync_canvassing_logs(sync: CanvassingSyncRequest, db: Session = Depends(get_db)):
+    """
+    Upload a batch of offline canvassing results. Voter and turf ids are validated
+    with one query each and valid items are upserted on (voter_id, turf_id) in a
+    single transaction; every item gets its own outcome.
+    """
+    items = sync.logs
+    voter_ids = {item.voter_id for item in items}
+    turf_ids = {item.turf_id for item in items}
+    known_voters = {row.id for row in db.query(Voter.id).filter(Voter.id.in_(voter_ids))} if voter_ids else set()
+    turf_owners = {row.id: row.user_id for row in db.query(Turf.id, Turf.user_id).filter(Turf.id.in_(turf_ids))} if turf_ids else {}
+
+    results = [None] * len(items)
+    latest = {}  # (voter_id, turf_id) -> index of the last item for that door
+    for index, item in enumerate(items):
+        if item.voter_id not in known_voters:
+            results[index] = ("error", "Voter not found")
+        elif item.turf_id not in turf_owners:
+            results[index] = ("error", "Turf not found")
+        else:
+            key = (item.voter_id, item.turf_id)
+            if key in latest:
+                # Only one upsert per door per statement; the later result wins
+                results[latest[key]] = ("superseded", "A later result for this door was in the same sync")
+            latest[key] = index
+
+    existing = {}
+    if latest:
+        existing = {
+            (row.voter_id, row.turf_id): row.interaction_date
+            for row in db.query(CanvassingLog.voter_id, CanvassingLog.turf_id, CanvassingLog.interaction_date).filter(
+                CanvassingLog.turf_id.in_({turf_id for _, turf_id in latest}),
+                tuple_(CanvassingLog.voter_id, CanvassingLog.turf_id).in_(list(latest))
+            )
+        }
+
+    now = datetime.datetime.utcnow()
+    rows = []
+    for (voter_id, turf_id), index in latest.items():
+        item = items[index]
+        interaction_date = _naive_utc(item.interaction_date) if item.interaction_date else now
+        saved_date = existing.get((voter_id, turf_id))
+        if saved_date is not None and interaction_date < saved_date:
+            # A device syncing late must not overwrite a newer knock on the same door
+            results[index] = ("superseded", "A newer result for this door is already saved")
+            continue
+        rows.append({
+            "voter_id": voter_id,
+            "turf_id": turf_id,
+            "result": item.result,
+            "notes": item.notes,
+            "interaction_date": interaction_date,
+            "user_id": turf_owners[turf_id]
+        })
+
+    written = set()
+    logs = CanvassingLog.__table__
+    for start in range(0, len(rows), SYNC_CHUNK_SIZE):
+        statement = dialect_insert(db, logs).values(rows[start:start + SYNC_CHUNK_SIZE])
+        statement = statement.on_conflict_do_update(
+            index_elements=["voter_id", "turf_id"],
+            set_={
+                "result": statement.excluded.result,
+                "notes": statement.excluded.notes,
+                "interaction_date": statement.excluded.interaction_date
+            },
+            # Also covers a newer log written by a concurrent sync after the lookup above
+            where=statement.excluded.interaction_date >= logs.c.interaction_date
+        )
+        # Rows the guard skipped are not returned
+        written.update(tuple(row) for row in db.execute(statement.returning(logs.c.voter_id, logs.c.turf_id)))
+    db.commit()
+
+    for row in rows:
+        key = (row["voter_id"], row["turf_id"])
+        if key not in written:
+            results[latest[key]] = ("superseded", "A newer result for this door is already saved")
+        else:
+            results[latest[key]] = ("updated" if key in existing else "created", None)
+
+    outcomes = [{
+        "index": index,
+        "client_id": item.client_id,
+        "voter_id": item.voter_id,
+        "turf_id": item.turf_id,
+        "outcome": outcome,
+        "detail": detail
+    } for index, (item, (outcome, detail)) in enumerate(zip(items, results))]
+    return {
+        "created": sum(1 for outcome, _ in results if outcome == "created"),
+        "updated": sum(1 for outcome, _ in results if outcome == "updated"),
+        "failed": sum(1 for outcome, _ in results if outcome == "error"),
+        "results": outcomes
+    }
+
 @router.delete("/turf/{turf_id}")
 def delete_turf(turf_id: int, db: Session = Depends(get_db)):
     turf = db.query(Turf).filter(Turf.id == turf_id).first()
     if not turf:
         raise HTTPException(status_code=404, detail="Turf not found")
     # Optionally, also delete associated canvassing logs if needed
+    db.query(TurfVoter).filter(TurfVoter.turf_id == turf_id).delete(synchronize_session=False)
+    walk_list_cache.invalidate(turf_id)
     db.delete(turf)
     db.commit()
     return {"detail": "Turf deleted successfully"} 
\ No newline at end of file
@@ -1,64 +1,108 @@
-import csv
-import io
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from typing import List
+
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from database import get_db
-from models import Voter
+from models import ImportJob, User
+from schemas import ImportJobRead
+from auth import get_current_user
+from geocoding import geocoding_pipeline
+from csv_rows import CsvImportError
+from importers import ImportInterrupted, import_voters
+from columnar_import import COLUMNAR_EXTENSIONS, import_voters_columnar, is_columnar
+from parallel_csv import import_voters_parallel
+from import_jobs import import_jobs
 
 router = APIRouter(prefix="/import", tags=["import"])
 
+def import_voters_and_geocode(
+    db: Session, file_obj, user_id: int, resume_from: int = 0, update_existing: bool = False,
+    columnar: bool = False, parallel: bool = False, progress=None
+):
+    if columnar:
+        importer = import_voters_columnar
+    elif parallel:
+        importer = import_voters_parallel
+    else:
+        importer = import_voters
+    try:
+        report = importer(db, file_obj, user_id, resume_from, update_existing, progress=progress)
+    except ImportInterrupted as e:
+        # Whatever was committed is kept; queue it for geocoding like a finished import
+        if e.report.rows_loaded or e.report.rows_updated:
+            geocoding_pipeline.sweep()
+        raise
+    # COPY does not hand back ids, so new and moved voters are picked up by the pipeline's sweep of ungeocoded rows
+    if report.rows_loaded or report.rows_updated:
+        geocoding_pipeline.sweep()
+    return report
+
 @router.post("/voters")
 async def import_voters_csv(
     file: UploadFile = File(...), 
-    db: Session = Depends(get_db)
+    resume_from: int = 0,
+    background: bool = False,
+    parallel: bool = False,
+    update_existing: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
 ):
     """
     Upload a CSV file of voters in the format:
     first_name,last_name,address,support_level,phone,email
-    """
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="File must be a .csv")
-
-    content = await file.read()  # read file content
-    # Convert bytes to a string
-    decoded = content.decode("utf-8")
-    # Wrap in a StringIO so we can use csv reader
-    reader = csv.DictReader(io.StringIO(decoded))
-
-    imported_count = 0
-    for row in reader:
-        # Ensure required columns exist
-        if "first_name" not in row or "last_name" not in row:
-            raise HTTPException(status_code=400, detail="CSV must have first_name, last_name columns")
+    or a Parquet/Arrow file (.parquet, .arrow, .feather, .ipc) with those
+    columns, which is read record batch by record batch and validated with
+    vectorized operations.
 
-        first_name = row["first_name"].strip()
-        last_name = row["last_name"].strip()
-
-        # Skip rows that are header rows (i.e., "First Name, Last Name")
-        if first_name.lower() == "first name" and last_name.lower() == "last name":
-            continue
-
-        # Convert support_level to int (handle missing or invalid cases)
-        try:
-            support_level = int(row.get("support_level", 0))
-        except ValueError:
-            support_level = 0
+    The file is parsed and loaded in chunks, each committed on its own. If an
+    import fails part-way, the error carries resume_from; upload the same file
+    again with ?resume_from=<that row> to continue where it stopped.
+    With update_existing, rows matching a voter already on file (by
+    external_id/voter_id column, else by name and address) update that voter
+    instead of adding a duplicate, so a refreshed voter file can be re-imported.
+    With ?background=true the import runs as a job; poll /import/jobs/{job_id}.
+    With ?parallel=true a large CSV is split into shards that are parsed in a
+    pool of IMPORT_PARSE_WORKERS processes and loaded in file order.
+    """
+    columnar = is_columnar(file.filename)
+    if not (columnar or file.filename.endswith(".csv")):
+        raise HTTPException(status_code=400, detail=f"File must be a .csv or one of {', '.join(COLUMNAR_EXTENSIONS)}")
 
-        voter = Voter(
-            first_name=first_name,
-            last_name=last_name,
-            address=row.get("address", "").strip(),
-            support_level=support_level,
-            phone=row.get("phone", "").strip(),
-            email=row.get("email", "").strip()
+    if background:
+        job_id = await run_in_threadpool(
+            import_jobs.submit, "voters", current_user.id, file.file, file.filename, import_voters_and_geocode,
+            user_id=current_user.id, resume_from=resume_from, update_existing=update_existing, columnar=columnar, parallel=parallel
         )
-        db.add(voter)
-        imported_count += 1
+        return {"status": "queued", "job_id": job_id}
 
-    db.commit()  # commit the transaction after all inserts
+    try:
+        report = await run_in_threadpool(
+            import_voters_and_geocode, db, file.file, current_user.id, resume_from, update_existing, columnar, parallel
+        )
+    except ImportInterrupted as e:
+        status_code = 400 if isinstance(e.error, CsvImportError) else 500
+        raise HTTPException(status_code=status_code, detail={
+            "error": str(e),
+            "resume_from": e.report.last_committed_row,
+            "report": e.report.to_dict()
+        })
 
     return {
         "status": "success",
-        "imported_count": imported_count
-    } 
\ No newline at end of file
+        "imported_count": report.rows_loaded,
+        **report.to_dict()
+    }
+
+@router.get("/jobs", response_model=List[ImportJobRead])
+def list_import_jobs(limit: int = 20, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return db.query(ImportJob).filter(ImportJob.user_id == current_user.id).order_by(ImportJob.created_at.desc()).limit(limit).all()
+
+@router.get("/jobs/{job_id}", response_model=ImportJobRead)
+def get_import_job(job_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Status, progress (row counts so far, throughput) and errors of a background import."""
+    job = db.query(ImportJob).filter(ImportJob.id == job_id, ImportJob.user_id == current_user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
@@ -2,50 +2,69 @@ from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
+import asyncio
 import csv
 import io
-from sqlalchemy import func
+import json
+from collections import Counter
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 from database import get_db
-from models import PhoneBankingCampaign, PhoneContact, Voter, User
-from schemas import CampaignCreate, CampaignRead, ContactUpdate, CampaignWithContacts
+from models import PhoneBankingCampaign, PhoneContact, CampaignStatCounter, User
+from schemas import (
+    CampaignCreate, CampaignRead, ContactUpdate, CampaignWithContacts, VolunteerCalls,
+    CallOutcomeBatch, CallOutcomeBatchResponse
+)
 from auth import get_current_user
+from dialer import apply_call_outcomes, dial_queues
+from import_jobs import import_jobs
+from csv_rows import CsvImportError
+from importers import ImportReport, add_voter_contacts, import_contacts
+from columnar_import import import_contacts_columnar, is_columnar
+from parallel_csv import import_contacts_parallel
+from campaign_stats import apply_stat_deltas, get_campaign_stats as read_campaign_stats, invalidate_campaign_stats, outcome_deltas
+from live_stats import stats_broadcaster
 
 router = APIRouter(tags=["phone_banking"])
 
-async def process_contacts_file(file: UploadFile, campaign_id: int, db: Session, current_user: User):
+# Largest outcome batch accepted in one request
+MAX_OUTCOME_BATCH = 1000
+# Seconds between SSE comments that keep idle stats streams from being closed by proxies
+STATS_KEEPALIVE_SECONDS = 15
+# Contacts fetched per cursor round-trip and CSV rows per streamed chunk during export
+EXPORT_CHUNK_SIZE = 1000
+
+def import_contacts_and_commit(
+    db: Session, file_obj, campaign_id: int, user_id: int, dedupe: bool = False,
+    columnar: bool = False, parallel: bool = False, progress=None
+) -> ImportReport:
+    if columnar:
+        importer = import_contacts_columnar
+    elif parallel:
+        importer = import_contacts_parallel
+    else:
+        importer = import_contacts
+    report = importer(db, file_obj, campaign_id, user_id, dedupe, progress=progress)
+    if report.rows_loaded:
+        # Imported contacts bypass the stat counters; counters built before this commit would miss them
+        invalidate_campaign_stats(db, campaign_id)
+    db.commit()
+    return report
+
+async def process_contacts_file(
+    file: UploadFile, campaign_id: int, db: Session, current_user: User, dedupe: bool = False, parallel: bool = False
+) -> ImportReport:
+    # Parsed chunk by chunk (record batch by record batch for Parquet/Arrow) from the spooled upload, off the event loop
     try:
-        content = await file.read()
-        decoded = content.decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(decoded))
-        
-        required_fields = ['first_name', 'last_name', 'phone_number']
-        headers = csv_reader.fieldnames
-        
-        if not headers or not all(field in headers for field in required_fields):
-            raise HTTPException(
-                status_code=400,
-                detail=f"CSV must contain the following columns: {', '.join(required_fields)}"
-            )
-
-        contacts = []
-        for row in csv_reader:
-            contact = PhoneContact(
-                campaign_id=campaign_id,
-                first_name=row['first_name'].strip(),
-                last_name=row['last_name'].strip(),
-                phone_number=row['phone_number'].strip(),
-                additional_info=row.get('additional_info', '').strip(),
-            )
-            contacts.append(contact)
-
-        db.bulk_save_objects(contacts)
-        db.commit()
-        return len(contacts)
-    except UnicodeDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid file encoding. Please use UTF-8")
+        return await run_in_threadpool(
+            import_contacts_and_commit, db, file.file, campaign_id, current_user.id, dedupe, is_columnar(file.filename), parallel
+        )
+    except CsvImportError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
 
 @router.post("/campaigns", response_model=CampaignWithContacts)
@@ -58,10 +77,20 @@ async def create_campaign(
     include_voters: bool = Form(False),
     min_support_level: Optional[int] = Form(None),
     voter_address_filter: Optional[str] = Form(None),
+    dedupe: bool = Form(False),
+    background: bool = Form(False),
+    parallel: bool = Form(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Create a new phone banking campaign with optional voter integration"""
+    """
+    Create a new phone banking campaign with optional voter integration. With
+    dedupe, phone numbers already in one of the user's active campaigns, or
+    repeated within this one, are skipped. With background, the contacts file
+    is imported as a job whose id comes back as import_job_id. The contacts
+    file may be CSV or, by extension, Parquet/Arrow (.parquet, .arrow, .feather).
+    With parallel, a large CSV is parsed across a pool of processes.
+    """
     campaign = PhoneBankingCampaign(
         name=name,
         description=description,
@@ -74,42 +103,35 @@ async def create_campaign(
     db.refresh(campaign)
 
     total_contacts = 0
+    import_report = None
+    import_job_id = None
 
     # Process CSV file if provided
-    if contacts_file:
-        total_contacts += await process_contacts_file(contacts_file, campaign.id, db, current_user)
+    if contacts_file and background:
+        import_job_id = await run_in_threadpool(
+            import_jobs.submit, "contacts", current_user.id, contacts_file.file, contacts_file.filename,
+            import_contacts_and_commit, campaign_id=campaign.id, user_id=current_user.id, dedupe=dedupe,
+            columnar=is_columnar(contacts_file.filename), parallel=parallel
+        )
+    elif contacts_file:
+        import_report = await process_contacts_file(contacts_file, campaign.id, db, current_user, dedupe, parallel)
+        total_contacts += import_report.rows_loaded
 
-    # Include voters if requested
+    # Include voters if requested; copied inside the database rather than through Python
     if include_voters:
-        query = db.query(Voter)
-        if min_support_level is not None:
-            query = query.filter(Voter.support_level >= min_support_level)
-        if voter_address_filter:
-            query = query.filter(Voter.address.ilike(f"%{voter_address_filter}%"))
-        
-        voters = query.all()
-        voter_contacts = []
-        
-        for voter in voters:
-            if voter.phone:  # Only include voters with phone numbers
-                contact = PhoneContact(
-                    campaign_id=campaign.id,
-                    first_name=voter.first_name,
-                    last_name=voter.last_name,
-                    phone_number=voter.phone,
-                    additional_info=f"Address: {voter.address}, Support Level: {voter.support_level}",
-                    support_level=voter.support_level
-                )
-                voter_contacts.append(contact)
-        
-        if voter_contacts:
-            db.bulk_save_objects(voter_contacts)
-            db.commit()
-            total_contacts += len(voter_contacts)
+        added = add_voter_contacts(db, campaign.id, current_user.id, min_support_level, voter_address_filter, dedupe)
+        if added:
+            invalidate_campaign_stats(db, campaign.id)
+        db.commit()
+        total_contacts += added
 
     # Refresh campaign to include contacts
     db.refresh(campaign)
-    return campaign
+    return CampaignWithContacts(
+        **CampaignRead.from_orm(campaign).dict(),
+        import_report=import_report.to_dict() if import_report else None,
+        import_job_id=import_job_id
+    )
 
 @router.get("/campaigns")
 async def get_campaigns(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -169,12 +191,18 @@ async def update_contact(
     if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
 
+    await run_in_threadpool(dial_queues.release, [contact_id])
+    old_status, old_support = contact.status, contact.support_level
     for key, value in contact_update.dict(exclude_unset=True).items():
         setattr(contact, key, value)
-    
-    contact
+    apply_stat_deltas(db, outcome_deltas(Counter(), contact.campaign_id, contact.volunteer_id,
+                                         old_status, old_support, contact.status, contact.support_level))
 
-@router.get("/campaigns/{campaign_id}/calls")
+    db.commit()
+    db.refresh(contact)
+    return contact
+
+@router.get("/campaigns/{campaign_id}/calls", response_model=VolunteerCalls)
 async def get_volunteer_calls(
     campaign_id: int,
     volunteer_id: int,
@@ -189,30 +217,16 @@ async def get_volunteer_calls(
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
-    # Get unassigned contacts or contacts assigned to this volunteer
-    contacts = db.query(PhoneContact).filter(
-        PhoneContact.campaign_id == campaign_id,
-        (PhoneContact.volunteer_id.is_(None) | (PhoneContact.volunteer_id == volunteer_id))
-    ).limit(campaign.calls_per_volunteer).all()
-
-    # Assign contacts to volunteer and commit changes
-    for contact in contacts:
-        if not contact.volunteer_id:
-            contact.volunteer_id = volunteer_id
-    
+    # Serialize before the queue's lease commit expires the campaign row
+    campaign_read = CampaignRead.from_orm(campaign)
+    # Served from the in-memory dial queue; the database is only hit when it needs refilling
     try:
-        db.commit()
-        # Refresh the contacts after commit to get updated data
-        for contact in contacts:
-            db.refresh(contact)
+        calls = await run_in_threadpool(dial_queues.next_contacts, db, campaign_id, volunteer_id, campaign.calls_per_volunteer)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to assign contacts")
 
-    return {
-        "campaign": campaign,
-        "calls": contacts
-    }
+    return VolunteerCalls(campaign=campaign_read, calls=calls)
 
 @router.put("/calls/{call_id}")
 async def update_call(
@@ -221,19 +235,47 @@ async def update_call(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    # Calls served by the dial queue are buffered and written back in batches
+    buffered = await run_in_threadpool(dial_queues.record_outcome, call_id, update.status, update.support_level, update.notes)
+    if buffered is not None:
+        return buffered
+
     contact = db.query(PhoneContact).filter(PhoneContact.id == call_id).first()
     if not contact:
         raise HTTPException(status_code=404, detail="Call not found")
 
+    await run_in_threadpool(dial_queues.release, [call_id])
+    apply_stat_deltas(db, outcome_deltas(Counter(), contact.campaign_id, contact.volunteer_id,
+                                         contact.status, contact.support_level, update.status, update.support_level))
     contact.status = update.status
     contact.support_level = update.support_level
     contact.notes = update.notes
     contact.last_called = datetime.utcnow()
+    contact.claim_expires_at = None  # called, so the claim is spent
 
     db.commit()
     db.refresh(contact)
     return contact
 
+@router.post("/calls/batch", response_model=CallOutcomeBatchResponse)
+async def update_calls_batch(
+    batch: CallOutcomeBatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Log many call outcomes in one transaction; unknown contacts are reported per row, not as a failure."""
+    if len(batch.outcomes) > MAX_OUTCOME_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_OUTCOME_BATCH} outcomes per batch")
+
+    try:
+        results = apply_call_outcomes(db, current_user.id, [outcome.dict() for outcome in batch.outcomes])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to save call outcomes")
+
+    return {"applied": sum(1 for result in results if result["ok"]), "results": results}
+
 @router.get("/campaigns/{campaign_id}/stats")
 async def get_campaign_stats(
     campaign_id: int,
@@ -248,37 +290,49 @@ async def get_campaign_stats(
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
-    # Get call status statistics
-    status_stats = db.query(
-        PhoneContact.status,
-        func.count(PhoneContact.id).label('count')
-    ).filter(
-        PhoneContact.campaign_id == campaign_id
-    ).group_by(PhoneContact.status).all()
+    # Counters are maintained by the call update paths; only a stale campaign pays for a rebuild
+    return read_campaign_stats(db, campaign)
 
-    # Get support level distribution
-    support_stats = db.query(
-        PhoneContact.support_level,
-        func.count(PhoneContact.id).label('count')
-    ).filter(
-        PhoneContact.campaign_id == campaign_id,
-        PhoneContact.support_level.isnot(None)
-    ).group_by(PhoneContact.support_level).all()
-
-    # Get volunteer statistics
-    volunteer_stats = db.query(
-        PhoneContact.volunteer_id,
-        func.count(PhoneContact.id).label('calls_made')
-    ).filter(
-        PhoneContact.campaign_id == campaign_id,
-        PhoneContact.volunteer_id.isnot(None)
-    ).group_by(PhoneContact.volunteer_id).all()
-
-    return {
-        "status_distribution": {status: count for status, count in status_stats},
-        "support_distribution": {level: count for level, count in support_stats},
-        "volunteer_stats": {volunteer_id: calls_made for volunteer_id, calls_made in volunteer_stats}
-    }
+@router.get("/campaigns/{campaign_id}/stats/stream")
+async def stream_campaign_stats(
+    campaign_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Server-sent events: a "snapshot" event with the full stats, then "delta"
+    events with coalesced count changes as calls are logged. A "delta" carrying
+    resync=true means the client should refetch the stats.
+    """
+    campaign = db.query(PhoneBankingCampaign).filter(
+        PhoneBankingCampaign.id == campaign_id,
+        PhoneBankingCampaign.user_id == current_user.id
+    ).first()
+
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    # Subscribe before the snapshot so no change falls between the two
+    queue = stats_broadcaster.subscribe(campaign_id)
+    snapshot = read_campaign_stats(db, campaign)
+    # The request's session (shared with get_current_user) would otherwise stay
+    # checked out, idle in transaction, until the client disconnects
+    db.close()
+
+    async def events():
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=STATS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: delta\ndata: {json.dumps(message)}\n\n"
+        finally:
+            stats_broadcaster.unsubscribe(campaign_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 @router.delete("/campaigns/{campaign_id}")
 async def delete_campaign(campaign_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -286,12 +340,14 @@ async def delete_campaign(campaign_id: int, db: Session = Depends(get_db), curre
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    # Delete associated contacts first
+    # Delete associated contacts and stat counters first
     db.query(PhoneContact).filter(PhoneContact.campaign_id == campaign_id).delete()
+    db.query(CampaignStatCounter).filter(CampaignStatCounter.campaign_id == campaign_id).delete()
     
     # Delete the campaign
     db.delete(campaign)
     db.commit()
+    dial_queues.discard(campaign_id)
     
     return {"message": "Campaign deleted successfully"}
 
@@ -302,37 +358,52 @@ async def export_campaign_data(campaign_id: int, db: Session = Depends(get_db),
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    contacts = db.query(PhoneContact).filter(PhoneContact.campaign_id == campaign_id).all()
-    
-    # Create CSV file in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write headers
-    writer.writerow(['First Name', 'Last Name', 'Phone Number', 'Status', 
-                    'Support Level', 'Notes', 'Last Called', 'Additional Info'])
-    
-    # Write data
-    for contact in contacts:
-        writer.writerow([
-            contact.first_name,
-            contact.last_name,
-            contact.phone_number,
-            contact.status,
-            contact.support_level,
-            contact.notes,
-            contact.last_called.isoformat() if contact.last_called else '',
-            contact.additional_info
-        ])
-    
-    # Prepare response
-    output.seek(0)
+    # Include outcomes the dial queue has not written back yet
+    await run_in_threadpool(dial_queues.flush)
+    contacts = db.query(
+        PhoneContact.first_name,
+        PhoneContact.last_name,
+        PhoneContact.phone_number,
+        PhoneContact.status,
+        PhoneContact.support_level,
+        PhoneContact.notes,
+        PhoneContact.last_called,
+        PhoneContact.additional_info
+    ).filter(PhoneContact.campaign_id == campaign_id).order_by(PhoneContact.id)
+
+    def rows():
+        # One small buffer is reused per chunk, so memory stays flat however large the campaign is
+        output = io.StringIO()
+        writer = csv.writer(output)
+
+        # Write headers
+        writer.writerow(['First Name', 'Last Name', 'Phone Number', 'Status', 
+                        'Support Level', 'Notes', 'Last Called', 'Additional Info'])
+
+        # Rows arrive from a server-side cursor EXPORT_CHUNK_SIZE at a time
+        for count, contact in enumerate(contacts.yield_per(EXPORT_CHUNK_SIZE), start=1):
+            writer.writerow([
+                contact.first_name,
+                contact.last_name,
+                contact.phone_number,
+                contact.status,
+                contact.support_level,
+                contact.notes,
+                contact.last_called.isoformat() if contact.last_called else '',
+                contact.additional_info
+            ])
+            if count % EXPORT_CHUNK_SIZE == 0:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+        yield output.getvalue()
+
     headers = {
         'Content-Disposition': f'attachment; filename="campaign_{campaign_id}_export.csv"'
     }
     
     return StreamingResponse(
-        iter([output.getvalue()]),
+        rows(),
         media_type="text/csv",
         headers=headers
-    ) 
\ No newline at end of file
+    )
@@ -7,6 +7,10 @@ from database import get_db
 from models import Voter, User
 from schemas import VoterCreate, VoterRead
 from auth import get_current_user
+from geocoding import geocoding_pipeline
+from turf_membership import remove_voter_memberships
+from phone_numbers import normalize_phone
+from voter_matching import voter_match_key
 
 router = APIRouter(tags=["voters"])
 
@@ -18,12 +22,15 @@ def create_voter(voter: VoterCreate, db: Session = Depends(get_db), current_user
         address=voter.address,
         support_level=voter.support_level,
         phone=voter.phone,
+        phone_key=normalize_phone(voter.phone),
         email=voter.email,
+        match_key=voter_match_key(voter.first_name, voter.last_name, voter.address),
         user_id=current_user.id  # Associate with current user
     )
     db.add(new_voter)
     db.commit()
     db.refresh(new_voter)
+    geocoding_pipeline.enqueue([new_voter.id])
     return new_voter
 
 @router.get("/", response_model=List[VoterRead])
@@ -47,15 +54,26 @@ def update_voter(voter_id: int, voter: VoterCreate, db: Session = Depends(get_db
     if not db_voter:
         raise HTTPException(status_code=404, detail="Voter not found")
     
+    address_changed = db_voter.address != voter.address
     db_voter.first_name = voter.first_name
     db_voter.last_name = voter.last_name
     db_voter.address = voter.address
     db_voter.support_level = voter.support_level
     db_voter.phone = voter.phone
+    db_voter.phone_key = normalize_phone(voter.phone)
     db_voter.email = voter.email
+    db_voter.match_key = voter_match_key(voter.first_name, voter.last_name, voter.address, db_voter.external_id)
+    if address_changed:
+        # Old coordinates no longer apply; the geocoding pipeline fills in the new ones and re-derives turf membership
+        db_voter.latitude = None
+        db_voter.longitude = None
+        db_voter.geocoded_at = None
+        remove_voter_memberships(db, [db_voter.id])
     
     db.commit()
     db.refresh(db_voter)
+    if address_changed:
+        geocoding_pipeline.enqueue([db_voter.id])
     return db_voter
 
 @router.delete("/{voter_id}", status_code=204)
@@ -65,6 +83,7 @@ def delete_voter(voter_id: int, db: Session = Depends(get_db), current_user: Use
     if not db_voter:
         raise HTTPException(status_code=404, detail="Voter not found")
     
+    remove_voter_memberships(db, [voter_id])
     db.delete(db_voter)
     db.commit()
     return {"detail": "Voter deleted successfully"}
\ No newline at end of file
@@ -19,6 +19,8 @@ class VoterRead(VoterBase):
     id: int
     phone: str = None
     email: str = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
     class Config:
         orm_mode = True
@@ -116,10 +118,30 @@ class ContactRead(ContactBase):
     support_level: Optional[int]
     notes: Optional[str]
     last_called: Optional[datetime]
+    volunteer_id: Optional[int] = None
+    claim_expires_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
 
+class CallOutcome(BaseModel):
+    contact_id: int
+    status: Optional[str] = None
+    support_level: Optional[int] = None
+    notes: Optional[str] = None
+
+class CallOutcomeBatch(BaseModel):
+    outcomes: List[CallOutcome]
+
+class CallOutcomeResult(BaseModel):
+    contact_id: int
+    ok: bool
+    error: Optional[str] = None
+
+class CallOutcomeBatchResponse(BaseModel):
+    applied: int
+    results: List[CallOutcomeResult]
+
 class CampaignBase(BaseModel):
     name: str
     description: str
@@ -137,12 +159,46 @@ class CampaignRead(CampaignBase):
     class Config:
         orm_mode = True
 
+class RejectedRow(BaseModel):
+    line: int
+    error: str
+
+class ImportReportRead(BaseModel):
+    rows_read: int
+    rows_loaded: int
+    rows_rejected: int
+    rows_duplicate: int = 0
+    rows_updated: int = 0
+    rejected: List[RejectedRow] = []
+    seconds: float
+    rows_per_second: Optional[int] = None
+
+class ImportJobRead(BaseModel):
+    id: str
+    kind: str
+    status: str
+    filename: Optional[str] = None
+    report: Optional[ImportReportRead] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
 class CampaignWithContacts(CampaignRead):
     contacts: List[ContactRead] = []
+    import_report: Optional[ImportReportRead] = None
+    import_job_id: Optional[str] = None  # set when the contacts file is imported in the background
 
     class Config:
         orm_mode = True
 
+class VolunteerCalls(BaseModel):
+    campaign: CampaignRead
+    calls: List[ContactRead]
+
 class TurfBase(BaseModel):
     name: str
     boundary: str  # JSON string representing polygon coordinates
@@ -159,6 +215,17 @@ class TurfRead(TurfBase):
     class Config:
         orm_mode = True
 
+class TurfCutRequest(BaseModel):
+    n_turfs: int
+    name_prefix: str = "Turf"
+    min_support_level: Optional[int] = None
+    max_support_level: Optional[int] = None
+    address_filter: Optional[str] = None
+
+class TurfCutResult(TurfRead):
+    door_count: int
+    voter_count: int
+
 class CanvassingLogBase(BaseModel):
     voter_id: int
     turf_id: int
@@ -179,6 +246,27 @@ class CanvassingLogRead(CanvassingLogBase):
     class Config:
         orm_mode = True
 
+class CanvassingSyncItem(CanvassingLogBase):
+    client_id: Optional[str] = None  # echoed back so offline clients can match outcomes to their queue
+    interaction_date: Optional[datetime] = None  # when the door was knocked; defaults to sync time
+
+class CanvassingSyncRequest(BaseModel):
+    logs: List[CanvassingSyncItem]
+
+class CanvassingSyncResult(BaseModel):
+    index: int
+    client_id: Optional[str] = None
+    voter_id: int
+    turf_id: int
+    outcome: str  # created, updated, superseded, error
+    detail: Optional[str] = None
+
+class CanvassingSyncResponse(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    results: List[CanvassingSyncResult]
+
 class EventBase(BaseModel):
     name: str
     date_time: datetime
@@ -0,0 +1,176 @@
+# backend/spatial.py
+import json
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (min_lat, min_lng, max_lat, max_lng)
+BBox = Tuple[float, float, float, float]
+
+
+def parse_boundary(boundary: str) -> List[List[float]]:
+    """Parse a turf boundary JSON string into a list of [lat, lng] pairs, raising ValueError if it is not one."""
+    if not isinstance(boundary, str):
+        raise ValueError("Boundary must be a JSON string")
+    polygon = json.loads(boundary)
+    if not isinstance(polygon, list) or not polygon:
+        raise ValueError("Boundary must be a non-empty list of [lat, lng] points")
+    try:
+        return [[float(point[0]), float(point[1])] for point in polygon]
+    except (TypeError, IndexError, KeyError):
+        raise ValueError("Boundary points must be [lat, lng] pairs")
+
+
+def polygon_bbox(polygon: List[List[float]]) -> BBox:
+    lats = [point[0] for point in polygon]
+    lngs = [point[1] for point in polygon]
+    return min(lats), min(lngs), max(lats), max(lngs)
+
+
+def turf_bbox(turf) -> Optional[BBox]:
+    """The turf's stored envelope, or one computed from its boundary for rows saved before bounds existed."""
+    if None not in (turf.min_lat, turf.min_lng, turf.max_lat, turf.max_lng):
+        return turf.min_lat, turf.min_lng, turf.max_lat, turf.max_lng
+    try:
+        return polygon_bbox(parse_boundary(turf.boundary))
+    except ValueError:
+        return None
+
+
+def set_turf_bbox(turf, polygon: List[List[float]]):
+    turf.min_lat, turf.min_lng, turf.max_lat, turf.max_lng = polygon_bbox(polygon)
+
+
+def filter_bbox(query, lat_column, lng_column, bbox: BBox):
+    """Restrict a query to rows whose coordinates fall inside the bbox (served by the (latitude, longitude) index)."""
+    min_lat, min_lng, max_lat, max_lng = bbox
+    return query.filter(
+        lat_column >= min_lat,
+        lat_column <= max_lat,
+        lng_column >= min_lng,
+        lng_column <= max_lng,
+    )
+
+
+def point_in_polygon(lat: float, lng: float, poly: List[List[float]]) -> bool:
+    # Treat longitude as x and latitude as y.
+    x = lng
+    y = lat
+    inside = False
+    n = len(poly)
+    p1 = poly[0]
+    x1, y1 = p1[1], p1[0]  # p1[1]=lng, p1[0]=lat
+    for i in range(1, n + 1):
+        p2 = poly[i % n]
+        x2, y2 = p2[1], p2[0]
+        if (y1 > y) != (y2 > y):
+            x_intersect = (x2 - x1) * (y - y1) / (y2 - y1 + 1e-10) + x1
+            if x < x_intersect:
+                inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def points_in_polygon(lats: np.ndarray, lngs: np.ndarray, poly: List[List[float]]) -> np.ndarray:
+    """
+    Vectorized point_in_polygon: classify arrays of points against one polygon.
+    The loop runs over the polygon's edges, not the points, and evaluates the
+    same expression as the scalar version so edge and vertex cases agree exactly.
+    """
+    y = np.asarray(lats, dtype=float)
+    x = np.asarray(lngs, dtype=float)
+    inside = np.zeros(y.shape, dtype=bool)
+    n = len(poly)
+    if n == 0 or y.size == 0:
+        return inside
+    x1, y1 = poly[0][1], poly[0][0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for i in range(1, n + 1):
+            p2 = poly[i % n]
+            x2, y2 = p2[1], p2[0]
+            crosses = (y1 > y) != (y2 > y)
+            if crosses.any():
+                x_intersect = (x2 - x1) * (y - y1) / (y2 - y1 + 1e-10) + x1
+                inside ^= crosses & (x < x_intersect)
+            x1, y1 = x2, y2
+    return inside
+
+
+class PointSet:
+    """
+    Voter coordinates sorted by latitude, so any polygon's candidates are found
+    with a binary search on its bbox instead of a scan over every point.
+    """
+
+    def __init__(self, ids: Sequence[int], lats: Sequence[float], lngs: Sequence[float]):
+        lats = np.asarray(lats, dtype=float)
+        order = np.argsort(lats, kind="stable")
+        self.ids = np.asarray(ids)[order]
+        self.lats = lats[order]
+        self.lngs = np.asarray(lngs, dtype=float)[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates(self, bbox: BBox) -> np.ndarray:
+        """Positions (into this set) of points inside the bbox."""
+        min_lat, min_lng, max_lat, max_lng = bbox
+        start = np.searchsorted(self.lats, min_lat, side="left")
+        stop = np.searchsorted(self.lats, max_lat, side="right")
+        window = np.arange(start, stop)
+        lngs = self.lngs[start:stop]
+        return window[(lngs >= min_lng) & (lngs <= max_lng)]
+
+    def within(self, poly: List[List[float]], bbox: Optional[BBox] = None) -> np.ndarray:
+        """Positions of points inside the polygon."""
+        if not poly:
+            return np.empty(0, dtype=np.intp)
+        positions = self.candidates(bbox or polygon_bbox(poly))
+        mask = points_in_polygon(self.lats[positions], self.lngs[positions], poly)
+        return positions[mask]
+
+
+def assign_points_to_polygons(points: PointSet, polygons: Sequence[List[List[float]]]) -> np.ndarray:
+    """
+    Classify every point against every polygon in one pass over the point set.
+    Returns, for each point (in PointSet order), the index of the first polygon
+    containing it, or -1 when it falls in none.
+    """
+    assignment = np.full(len(points), -1, dtype=np.intp)
+    for index, poly in enumerate(polygons):
+        positions = points.within(poly)
+        unassigned = positions[assignment[positions] == -1]
+        assignment[unassigned] = index
+    return assignment
+
+
+def benchmark_point_in_polygon(n_points: int = 200_000, n_vertices: int = 64, seed: int = 0) -> dict:
+    """Time the scalar and vectorized paths on the same random points and check they agree."""
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radii = 0.05 * (1 + 0.3 * rng.random(n_vertices))
+    poly = [[44.97 + r * np.sin(a), -93.26 + r * np.cos(a)] for a, r in zip(angles, radii)]
+    lats = 44.97 + rng.uniform(-0.08, 0.08, n_points)
+    lngs = -93.26 + rng.uniform(-0.08, 0.08, n_points)
+
+    start = time.perf_counter()
+    scalar = np.array([point_in_polygon(lat, lng, poly) for lat, lng in zip(lats.tolist(), lngs.tolist())])
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = points_in_polygon(lats, lngs, poly)
+    vectorized_seconds = time.perf_counter() - start
+
+    return {
+        "points": n_points,
+        "vertices": n_vertices,
+        "scalar_seconds": round(scalar_seconds, 4),
+        "vectorized_seconds": round(vectorized_seconds, 4),
+        "speedup": round(scalar_seconds / vectorized_seconds, 1) if vectorized_seconds else None,
+        "results_match": bool(np.array_equal(scalar, vectorized)),
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_point_in_polygon())
@@ -0,0 +1,43 @@
+# backend/tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+# database.py builds its engine at import, so point it at the test database first.
+# TEST_DATABASE_URL is wiped by the tests; without it they run against a throwaway SQLite file.
+config.DATABASE_URL = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/polistudio-test.db"
+
+import database  # noqa: E402
+from models import Base, User  # noqa: E402
+
+database.engine.echo = False
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    Base.metadata.drop_all(bind=database.engine)
+    Base.metadata.create_all(bind=database.engine)
+    yield
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(email=f"user{os.urandom(4).hex()}@example.org", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user
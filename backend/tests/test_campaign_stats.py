@@ -0,0 +1,47 @@
+# backend/tests/test_campaign_stats.py
+import io
+from collections import Counter
+
+from campaign_stats import apply_stat_deltas, get_campaign_stats, outcome_deltas
+from live_stats import stats_broadcaster
+from models import PhoneBankingCampaign, PhoneContact
+from routers.phone_banking import import_contacts_and_commit
+
+
+def test_import_after_stats_read_does_not_drive_counters_negative(db, user):
+    campaign = PhoneBankingCampaign(name="Stats", description="", script="", calls_per_volunteer=5, user_id=user.id)
+    db.add(campaign)
+    db.commit()
+    assert get_campaign_stats(db, campaign)["status_distribution"] == {}
+
+    contacts_csv = b"first_name,last_name,phone_number\nAda,Lovelace,6125550100\nAlan,Turing,6125550101\n"
+    report = import_contacts_and_commit(db, io.BytesIO(contacts_csv), campaign.id, user.id)
+    assert report.rows_loaded == 2
+
+    contact = db.query(PhoneContact).filter(PhoneContact.campaign_id == campaign.id).first()
+    contact.status = "completed"
+    deltas = Counter()
+    outcome_deltas(deltas, campaign.id, None, "pending", None, "completed", None)
+    apply_stat_deltas(db, deltas)
+    db.commit()
+
+    assert get_campaign_stats(db, campaign)["status_distribution"] == {"pending": 1, "completed": 1}
+
+
+class UnreachableRedis:
+    def publish(self, channel, message):
+        raise ConnectionError("Redis is down")
+
+
+def test_commit_succeeds_when_live_stats_cannot_be_published(db, user, monkeypatch):
+    campaign = PhoneBankingCampaign(name="Redis down", description="", script="", calls_per_volunteer=5, user_id=user.id)
+    db.add(campaign)
+    db.commit()
+    monkeypatch.setattr(stats_broadcaster, "_redis", UnreachableRedis())
+
+    deltas = Counter()
+    outcome_deltas(deltas, campaign.id, None, "pending", None, "completed", None)
+    apply_stat_deltas(db, deltas)
+    db.commit()
+
+    assert campaign.id in stats_broadcaster._resync
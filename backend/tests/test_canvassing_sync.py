@@ -0,0 +1,52 @@
+# backend/tests/test_canvassing_sync.py
+import datetime
+import json
+
+from models import CanvassingLog, Turf, Voter
+from routers.door_knocking import sync_canvassing_logs
+from schemas import CanvassingSyncRequest
+
+
+def test_late_sync_does_not_overwrite_a_newer_result(db, user):
+    turf = Turf(name="Sync", boundary=json.dumps([[44.0, -94.0], [44.0, -93.0], [45.0, -93.0]]), user_id=user.id)
+    voter = Voter(first_name="A", last_name="B", user_id=user.id)
+    db.add_all([turf, voter])
+    db.commit()
+    morning = datetime.datetime(2026, 10, 1, 9)
+    evening = datetime.datetime(2026, 10, 1, 18)
+
+    def sync(result, interaction_date):
+        request = CanvassingSyncRequest(logs=[{
+            "voter_id": voter.id, "turf_id": turf.id, "result": result, "interaction_date": interaction_date
+        }])
+        return sync_canvassing_logs(request, db)["results"][0]["outcome"]
+
+    assert sync("Support", evening) == "created"
+    assert sync("Refused", morning) == "superseded"
+    db.expire_all()
+    log = db.query(CanvassingLog).filter(CanvassingLog.voter_id == voter.id).one()
+    assert (log.result, log.interaction_date) == ("Support", evening)
+
+    assert sync("Undecided", evening + datetime.timedelta(hours=1)) == "updated"
+    db.expire_all()
+    assert db.query(CanvassingLog.result).filter(CanvassingLog.voter_id == voter.id).scalar() == "Undecided"
+
+
+def test_sync_accepts_timestamps_with_an_offset(db, user):
+    turf = Turf(name="Offsets", boundary=json.dumps([[44.0, -94.0], [44.0, -93.0], [45.0, -93.0]]), user_id=user.id)
+    voter = Voter(first_name="C", last_name="D", user_id=user.id)
+    db.add_all([turf, voter])
+    db.commit()
+
+    def sync(result, interaction_date):
+        request = CanvassingSyncRequest(logs=[{
+            "voter_id": voter.id, "turf_id": turf.id, "result": result, "interaction_date": interaction_date
+        }])
+        return sync_canvassing_logs(request, db)["results"][0]["outcome"]
+
+    assert sync("Support", "2026-10-01T10:00:00Z") == "created"
+    assert sync("Refused", "2026-10-01T11:00:00+02:00") == "superseded"
+    assert sync("Undecided", "2026-10-01T12:00:00+02:00") == "updated"
+    db.expire_all()
+    log = db.query(CanvassingLog).filter(CanvassingLog.voter_id == voter.id).one()
+    assert (log.result, log.interaction_date) == ("Undecided", datetime.datetime(2026, 10, 1, 10))
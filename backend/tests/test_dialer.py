@@ -0,0 +1,135 @@
+# backend/tests/test_dialer.py
+import datetime
+import threading
+
+import pytest
+
+import database
+from dialer import DialQueues, lease_contacts
+from migrate_db import backfill_contact_claims
+from models import PhoneBankingCampaign, PhoneContact, Volunteer
+
+postgres_only = pytest.mark.skipif(
+    database.engine.dialect.name != "postgresql",
+    reason="concurrent claims rely on FOR UPDATE SKIP LOCKED; set TEST_DATABASE_URL to a PostgreSQL database"
+)
+
+
+def make_campaign(db, user, n_contacts: int) -> PhoneBankingCampaign:
+    campaign = PhoneBankingCampaign(name="Stress", description="", script="", calls_per_volunteer=5, user_id=user.id)
+    db.add(campaign)
+    db.flush()
+    db.add_all([
+        PhoneContact(campaign_id=campaign.id, first_name=f"C{i}", last_name="Test", phone_number=f"612555{i:04d}",
+                     status="pending", user_id=user.id)
+        for i in range(n_contacts)
+    ])
+    db.commit()
+    return campaign
+
+
+def make_volunteers(db, user, n_volunteers: int):
+    volunteers = [
+        Volunteer(first_name=f"V{i}", last_name="Test", email=f"v{i}-{user.id}@example.org", user_id=user.id)
+        for i in range(n_volunteers)
+    ]
+    db.add_all(volunteers)
+    db.commit()
+    return [volunteer.id for volunteer in volunteers]
+
+
+def run_threads(n_threads: int, target):
+    errors = []
+    barrier = threading.Barrier(n_threads)
+
+    def run(index):
+        try:
+            barrier.wait()
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+
+
+@postgres_only
+def test_concurrent_leases_never_hand_out_a_contact_twice(db, user):
+    campaign = make_campaign(db, user, n_contacts=400)
+    leased = []
+
+    def claim(_):
+        session = database.SessionLocal()
+        try:
+            while True:
+                batch = lease_contacts(session, campaign.id, 7)
+                session.commit()
+                if not batch:
+                    return
+                leased.extend(entry["id"] for entry in batch)
+        finally:
+            session.close()
+
+    run_threads(8, claim)
+    assert len(leased) == len(set(leased)) == 400
+
+
+@postgres_only
+def test_dial_queues_in_separate_processes_serve_disjoint_contacts(db, user):
+    campaign = make_campaign(db, user, n_contacts=300)
+    volunteer_ids = make_volunteers(db, user, 12)
+    # One DialQueues per simulated API process, several volunteers on each
+    processes = [DialQueues(prefetch_size=20, sync_outcomes=False) for _ in range(3)]
+    served = {}
+
+    def serve(index):
+        queues = processes[index % len(processes)]
+        session = database.SessionLocal()
+        try:
+            for _ in range(4):
+                for entry in queues.next_contacts(session, campaign.id, volunteer_ids[index], count=5):
+                    served.setdefault(entry["id"], set()).add(volunteer_ids[index])
+                queues.flush()
+        finally:
+            session.close()
+
+    run_threads(12, serve)
+    for queues in processes:
+        queues.stop(timeout=5)
+    assert all(len(volunteers) == 1 for volunteers in served.values())
+    assert len(served) == 12 * 5
+
+
+def test_expired_leases_are_leased_again(db, user):
+    campaign = make_campaign(db, user, n_contacts=2)
+    first = lease_contacts(db, campaign.id, 10)
+    db.commit()
+    assert len(first) == 2
+    assert lease_contacts(db, campaign.id, 10) == []
+
+    db.query(PhoneContact).filter(PhoneContact.id == first[0]["id"]).update(
+        {PhoneContact.claim_expires_at: datetime.datetime.utcnow() - datetime.timedelta(minutes=1)}
+    )
+    db.commit()
+    assert [entry["id"] for entry in lease_contacts(db, campaign.id, 10)] == [first[0]["id"]]
+
+
+def test_migration_backfills_claims_made_before_leases(db, user):
+    campaign = make_campaign(db, user, n_contacts=3)
+    volunteer_id = make_volunteers(db, user, 1)[0]
+    contacts = db.query(PhoneContact).filter(PhoneContact.campaign_id == campaign.id).order_by(PhoneContact.id).all()
+    contacts[0].volunteer_id = volunteer_id
+    contacts[1].volunteer_id = volunteer_id
+    contacts[1].status = "completed"
+    db.commit()
+
+    backfill_contact_claims(db)
+    db.expire_all()
+    assert contacts[0].claim_expires_at > datetime.datetime.utcnow()
+    assert contacts[1].claim_expires_at is None
+    assert contacts[2].claim_expires_at is None
+    assert [entry["id"] for entry in lease_contacts(db, campaign.id, 10)] == [contacts[2].id]
@@ -0,0 +1,86 @@
+# backend/tests/test_parallel_csv.py
+import pytest
+
+from csv_rows import (
+    VOTER_REQUIRED_FIELDS,
+    parse_shard,
+    parse_voter_row,
+    read_csv_chunks,
+    read_header,
+    split_at_line_boundaries,
+)
+from parallel_csv import parse_in_parallel, parse_pool
+
+SHARD_BYTES = 200
+
+
+@pytest.fixture(scope="module", autouse=True)
+def stop_parse_pool():
+    yield
+    parse_pool.stop()
+
+
+def write_voters_csv(tmp_path) -> str:
+    lines = ["first_name,last_name,address,support_level"]
+    for i in range(120):
+        if i % 17 == 5:
+            # A stray quote inside an unquoted field throws the quote count off
+            lines.append(f'Pat,O"Brien{i},{i} Main St,3')
+        elif i % 11 == 3:
+            lines.append(f'"Ann\nMarie {i}",Lee,"{i} Oak Ave\nApt 2",4')
+        elif i % 13 == 7:
+            lines.append(f",,{i} Elm St,1")
+        else:
+            lines.append(f"Voter{i},Test,{i} Pine Rd,{i % 5}")
+    path = tmp_path / "voters.csv"
+    path.write_bytes(("\n".join(lines) + "\n").encode("utf-8"))
+    return str(path)
+
+
+def parse_serially_for_comparison(path: str):
+    rows, rejected = [], []
+    with open(path, "rb") as file_obj:
+        for chunk in read_csv_chunks(file_obj, VOTER_REQUIRED_FIELDS):
+            for line, raw in chunk:
+                try:
+                    row = parse_voter_row(raw)
+                except ValueError as e:
+                    rejected.append((line, str(e)))
+                    continue
+                rows.append(row)
+    return rows, rejected
+
+
+def test_parse_shard_reports_a_cut_inside_a_quoted_field(tmp_path):
+    path = tmp_path / "cut.csv"
+    path.write_bytes(b'first_name,last_name\n"Ann\nMarie",Lee\n')
+    with open(path, "rb") as file_obj:
+        fieldnames, data_start = read_header(file_obj, VOTER_REQUIRED_FIELDS)
+
+    inside = parse_shard(str(path), data_start, data_start + len(b'"Ann\n'), fieldnames, parse_voter_row)
+    whole = parse_shard(str(path), data_start, path.stat().st_size, fieldnames, parse_voter_row)
+
+    assert not inside.complete
+    assert whole.complete
+    assert [row["first_name"] for _, row in whole.rows] == ["Ann\nMarie"]
+
+
+def test_parallel_parse_matches_serial_parse_despite_stray_quotes(tmp_path):
+    path = write_voters_csv(tmp_path)
+    with open(path, "rb") as file_obj:
+        fieldnames, data_start = read_header(file_obj, VOTER_REQUIRED_FIELDS)
+        ranges = split_at_line_boundaries(file_obj, data_start, SHARD_BYTES)
+    # The stray quotes must actually produce a bad cut, or the fallback goes untested
+    assert any(not parse_shard(path, start, end, fieldnames, parse_voter_row).complete for start, end in ranges)
+
+    rows, rejected, rows_read = [], [], 0
+    for rows_before, lines_before, result in parse_in_parallel(path, parse_voter_row, VOTER_REQUIRED_FIELDS, 2, SHARD_BYTES):
+        assert rows_before == rows_read
+        rows.extend(row for _, row in result.rows)
+        rejected.extend((lines_before + line, error) for _, line, error in result.rejected)
+        rows_read += result.rows_read
+
+    expected_rows, expected_rejected = parse_serially_for_comparison(path)
+    assert rows_read == 120
+    assert rows == expected_rows
+    assert rejected == expected_rejected
@@ -0,0 +1,31 @@
+# backend/tests/test_phone_numbers.py
+import pandas as pd
+import pytest
+
+from phone_numbers import normalize_phone, normalize_phones
+
+NUMBERS = [
+    "612-555-0100",
+    "(612) 555-0100 ext. 4",
+    "1 612 555 0100",
+    "+1 612 555 0100",
+    "+44 20 7946 0958",
+    "0044 20 7946 0958",
+    "612-555-010",
+    "555-0100",
+    "+1234567",
+    "+1234567890123456",
+    "0612 555 0100",
+    "  612.555.0100  x12",
+    "phone: 612 555 0100 #3",
+    "",
+    None,
+]
+
+
+@pytest.mark.parametrize("dtype", [object, "string", "string[pyarrow]"])
+@pytest.mark.parametrize("country_code", ["1", "44"])
+def test_normalize_phones_matches_normalize_phone(dtype, country_code):
+    values = pd.Series(NUMBERS, dtype=dtype)
+    expected = [normalize_phone(number, country_code) for number in NUMBERS]
+    assert normalize_phones(values, country_code).tolist() == expected
@@ -0,0 +1,57 @@
+# backend/tests/test_turf_voters.py
+import contextlib
+import json
+
+from sqlalchemy import event
+
+import database
+from models import CanvassingLog, Turf, Voter
+from routers.door_knocking import get_turf_voters
+from spatial import parse_boundary, set_turf_bbox
+from turf_membership import rebuild_turf_membership
+
+
+@contextlib.contextmanager
+def count_queries():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(database.engine, "before_cursor_execute", record)
+
+
+def make_turf(db, user, n_voters: int, n_canvassed: int) -> Turf:
+    boundary = json.dumps([[44.0, -94.0], [44.0, -93.0], [45.0, -93.0], [45.0, -94.0]])
+    turf = Turf(name=f"{n_voters} voters", boundary=boundary, user_id=user.id)
+    set_turf_bbox(turf, parse_boundary(boundary))
+    db.add(turf)
+    voters = [
+        Voter(first_name=f"V{i}", last_name="Test", latitude=44.1 + i * 0.001, longitude=-93.5, user_id=user.id)
+        for i in range(n_voters)
+    ]
+    db.add_all(voters)
+    db.flush()
+    db.add_all([CanvassingLog(voter_id=voter.id, turf_id=turf.id, result="Support", user_id=user.id) for voter in voters[:n_canvassed]])
+    rebuild_turf_membership(db, turf)
+    db.commit()
+    return turf
+
+
+def test_turf_voter_listing_query_count_does_not_grow_with_turf_size(db, user):
+    small = make_turf(db, user, n_voters=3, n_canvassed=1)
+    large = make_turf(db, user, n_voters=60, n_canvassed=25)
+
+    counts = {}
+    for turf in (small, large):
+        db.expire_all()
+        with count_queries() as statements:
+            voters = get_turf_voters(turf.id, db)
+        counts[turf.id] = len(statements)
+        assert sum(voter["status"] == "completed" for voter in voters) == (1 if turf is small else 25)
+
+    assert counts[small.id] == counts[large.id]
@@ -0,0 +1,88 @@
+# backend/tests/test_voter_upsert.py
+import datetime
+
+import pandas as pd
+
+from csv_rows import parse_voter_row
+from importers import ImportReport, load_voter_rows
+from models import Voter
+from voter_matching import voter_match_key, voter_match_keys
+
+ARROW_STRING = "string[pyarrow]"
+
+
+def voter_row(user, **fields) -> dict:
+    row = parse_voter_row({"first_name": "Ada", "last_name": "Lovelace", "address": "12 Main Street", **fields})
+    row["user_id"] = user.id
+    return row
+
+
+def test_voter_match_keys_match_voter_match_key():
+    voters = [
+        ("Ada", "Lovelace", "12 Main Street", ""),
+        ("ADA", "lovelace.", "12 main st", ""),
+        ("Ada", "Lovelace", "12 Main St., Apt. 4", ""),
+        ("José", "Núñez", "5 North Avenue", ""),
+        ("", "", "", ""),
+        ("Ada", "Lovelace", "12 Main Street", "MN-001"),
+        ("Alan", "Turing", "1 Park Road", " mn-001 "),
+    ]
+    first_names, last_names, addresses, external_ids = (pd.Series(column, dtype=ARROW_STRING) for column in zip(*voters))
+    expected = [voter_match_key(first, last, address, external_id) for first, last, address, external_id in voters]
+    assert voter_match_keys(first_names, last_names, addresses, external_ids) == expected
+
+
+def test_upsert_updates_matches_and_inserts_the_rest(db, user):
+    report = ImportReport()
+    load_voter_rows(db, user.id, [voter_row(user, support_level="2")], False, report)
+    db.commit()
+
+    rows = [
+        voter_row(user, first_name="ADA", address="12 Main St", support_level="4"),
+        voter_row(user, first_name="Alan", last_name="Turing"),
+    ]
+    inserted = load_voter_rows(db, user.id, rows, True, report)
+    db.commit()
+
+    voters = db.query(Voter).filter(Voter.user_id == user.id).order_by(Voter.id).all()
+    assert inserted == 1
+    assert report.rows_updated == 1
+    assert [(voter.first_name, voter.support_level) for voter in voters] == [("ADA", 4), ("Alan", 0)]
+
+
+def test_upsert_does_not_overwrite_with_blank_cells(db, user):
+    report = ImportReport()
+    load_voter_rows(db, user.id, [voter_row(user, support_level="3", phone="612-555-0100", email="ada@example.org")], False, report)
+    db.commit()
+
+    load_voter_rows(db, user.id, [voter_row(user, support_level="", phone="", email="")], True, report)
+    db.commit()
+
+    voter = db.query(Voter).filter(Voter.user_id == user.id).one()
+    assert (voter.support_level, voter.phone, voter.email) == (3, "612-555-0100", "ada@example.org")
+    assert report.rows_updated == 0
+    assert report.rows_duplicate == 1
+
+
+def test_upsert_clears_coordinates_of_voters_who_moved(db, user):
+    report = ImportReport()
+    load_voter_rows(db, user.id, [
+        voter_row(user, external_id="MN-001"),
+        voter_row(user, first_name="Alan", last_name="Turing", address="1 Park Road", external_id="MN-002"),
+    ], False, report)
+    db.commit()
+    geocoded_at = datetime.datetime(2024, 1, 1)
+    db.query(Voter).filter(Voter.user_id == user.id).update(
+        {Voter.latitude: 44.97, Voter.longitude: -93.26, Voter.geocoded_at: geocoded_at}, synchronize_session=False
+    )
+    db.commit()
+
+    load_voter_rows(db, user.id, [
+        voter_row(user, address="99 River Road", external_id="MN-001"),
+        voter_row(user, first_name="Alan", last_name="Turing", address="1 Park Rd.", support_level="5", external_id="MN-002"),
+    ], True, report)
+    db.commit()
+
+    moved, respelled = db.query(Voter).filter(Voter.user_id == user.id).order_by(Voter.id).all()
+    assert (moved.address, moved.latitude, moved.longitude, moved.geocoded_at) == ("99 River Road", None, None, None)
+    assert (respelled.latitude, respelled.longitude, respelled.geocoded_at) == (44.97, -93.26, geocoded_at)
@@ -0,0 +1,179 @@
+# backend/turf_cutting.py
+import datetime
+import json
+import math
+import time
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import Turf, Voter
+from spatial import PointSet, filter_bbox, set_turf_bbox
+from turf_membership import insert_memberships
+
+# Hulls are pushed outward by about a metre so doors on the hull edge still test as inside
+HULL_BUFFER_DEGREES = 1e-5
+
+
+def partition_points(lats: np.ndarray, lngs: np.ndarray, n_parts: int) -> np.ndarray:
+    """
+    Split points into n_parts compact groups of near-equal size by recursive
+    bisection: each cell is cut across its longer side at the point-count
+    quantile matching how many parts each half must still produce.
+    Returns a part label per point. O(n log n_parts).
+    """
+    n = len(lats)
+    labels = np.zeros(n, dtype=np.intp)
+    if n == 0 or n_parts <= 1:
+        return labels
+    scale = math.cos(math.radians(float(np.mean(lats))))
+    coords = (np.asarray(lats, dtype=float), np.asarray(lngs, dtype=float) * scale)
+    next_label = 0
+    stack = [(np.arange(n), n_parts)]
+    while stack:
+        indices, parts = stack.pop()
+        if parts == 1 or len(indices) <= 1:
+            labels[indices] = next_label
+            next_label += 1
+            continue
+        spans = [axis[indices].max() - axis[indices].min() for axis in coords]
+        values = coords[int(np.argmax(spans))][indices]
+        left_parts = parts // 2
+        split = int(round(len(indices) * left_parts / parts))
+        split = min(max(split, 1), len(indices) - 1)
+        order = np.argpartition(values, split)
+        stack.append((indices[order[split:]], parts - left_parts))
+        stack.append((indices[order[:split]], left_parts))
+    return labels
+
+
+def _padded_bbox(points: np.ndarray) -> List[List[float]]:
+    min_lng, min_lat = (points.min(axis=0) - HULL_BUFFER_DEGREES).tolist()
+    max_lng, max_lat = (points.max(axis=0) + HULL_BUFFER_DEGREES).tolist()
+    return [[min_lat, min_lng], [min_lat, max_lng], [max_lat, max_lng], [max_lat, min_lng]]
+
+
+def convex_hull(lats: np.ndarray, lngs: np.ndarray) -> List[List[float]]:
+    """Convex hull (Andrew's monotone chain) as [lat, lng] vertices, padded by HULL_BUFFER_DEGREES."""
+    points = np.unique(np.column_stack([lngs, lats]), axis=0)  # sorted by x (lng) then y (lat)
+    if len(points) < 3:
+        return _padded_bbox(points)
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    rows = points.tolist()
+    lower, upper = [], []
+    for point in rows:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+    for point in reversed(rows):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+    hull = np.array(lower[:-1] + upper[:-1])
+    if len(hull) < 3:
+        # Collinear points have no area to pad outward from
+        return _padded_bbox(points)
+    centroid = hull.mean(axis=0)
+    offsets = hull - centroid
+    lengths = np.hypot(offsets[:, 0], offsets[:, 1])
+    lengths[lengths == 0] = 1.0
+    padded = hull + offsets / lengths[:, None] * HULL_BUFFER_DEGREES
+    return [[float(lat), float(lng)] for lng, lat in padded]
+
+
+def cut_turfs(
+    db: Session,
+    user_id: int,
+    n_turfs: int,
+    name_prefix: str = "Turf",
+    min_support_level: Optional[int] = None,
+    max_support_level: Optional[int] = None,
+    address_filter: Optional[str] = None,
+) -> List[dict]:
+    """
+    Partition the user's geocoded voters matching the filters into n_turfs turfs
+    with roughly equal door counts, save them with hull boundaries and populate
+    their turf_voters membership. Doors (distinct coordinates) are partitioned,
+    so every voter at an address lands in the same turf. The caller commits.
+    """
+    query = db.query(Voter.latitude, Voter.longitude).filter(
+        Voter.user_id == user_id,
+        Voter.latitude.isnot(None),
+        Voter.longitude.isnot(None)
+    )
+    if min_support_level is not None:
+        query = query.filter(Voter.support_level >= min_support_level)
+    if max_support_level is not None:
+        query = query.filter(Voter.support_level <= max_support_level)
+    if address_filter:
+        query = query.filter(Voter.address.ilike(f"%{address_filter}%"))
+    rows = query.all()
+    if not rows:
+        return []
+
+    doors = np.unique(np.array(rows, dtype=float), axis=0)
+    n_turfs = min(n_turfs, len(doors))
+    labels = partition_points(doors[:, 0], doors[:, 1], n_turfs)
+
+    # Membership is geometric, so it covers every geocoded voter inside each new boundary, filtered or not
+    envelope = (float(doors[:, 0].min()), float(doors[:, 1].min()), float(doors[:, 0].max()), float(doors[:, 1].max()))
+    padded = (envelope[0] - 1e-3, envelope[1] - 1e-3, envelope[2] + 1e-3, envelope[3] + 1e-3)
+    member_rows = filter_bbox(db.query(Voter.id, Voter.latitude, Voter.longitude), Voter.latitude, Voter.longitude, padded).all()
+    points = PointSet([row.id for row in member_rows], [row.latitude for row in member_rows], [row.longitude for row in member_rows])
+
+    now = datetime.datetime.utcnow()
+    created = []
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(n_turfs + 1))
+    for part in range(n_turfs):
+        part_doors = doors[order[bounds[part]:bounds[part + 1]]]
+        boundary = convex_hull(part_doors[:, 0], part_doors[:, 1])
+        turf = Turf(name=f"{name_prefix} {part + 1}", boundary=json.dumps(boundary), user_id=user_id)
+        set_turf_bbox(turf, boundary)
+        db.add(turf)
+        db.flush()
+        voter_ids = points.ids[points.within(boundary)].tolist()
+        insert_memberships(db, [{"turf_id": turf.id, "voter_id": voter_id} for voter_id in voter_ids])
+        turf.membership_updated_at = now
+        turf.membership_version = 1
+        created.append({"turf": turf, "door_count": len(part_doors), "voter_count": len(voter_ids)})
+    return created
+
+
+def benchmark_turf_cutting(n_voters: int = 500_000, n_turfs: int = 500, seed: int = 0) -> dict:
+    """Time partitioning and hull generation on synthetic clustered voters (no database)."""
+    rng = np.random.default_rng(seed)
+    centres = rng.uniform([44.85, -93.35], [45.05, -93.15], size=(40, 2))
+    picks = rng.integers(0, len(centres), n_voters)
+    lats = centres[picks, 0] + rng.normal(0, 0.01, n_voters)
+    lngs = centres[picks, 1] + rng.normal(0, 0.01, n_voters)
+
+    start = time.perf_counter()
+    labels = partition_points(lats, lngs, n_turfs)
+    partition_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(n_turfs + 1))
+    for part in range(n_turfs):
+        members = order[bounds[part]:bounds[part + 1]]
+        convex_hull(lats[members], lngs[members])
+    hull_seconds = time.perf_counter() - start
+
+    sizes = np.bincount(labels, minlength=n_turfs)
+    return {
+        "voters": n_voters,
+        "turfs": n_turfs,
+        "partition_seconds": round(partition_seconds, 3),
+        "hull_seconds": round(hull_seconds, 3),
+        "min_doors": int(sizes.min()),
+        "max_doors": int(sizes.max()),
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_turf_cutting())
@@ -0,0 +1,131 @@
+# backend/turf_membership.py
+import datetime
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models import Turf, TurfVoter, Voter
+from spatial import PointSet, filter_bbox, parse_boundary, turf_bbox
+
+INSERT_CHUNK_SIZE = 5000
+
+
+def insert_memberships(db: Session, pairs: List[dict]):
+    for start in range(0, len(pairs), INSERT_CHUNK_SIZE):
+        db.execute(insert(TurfVoter.__table__), pairs[start:start + INSERT_CHUNK_SIZE])
+
+
+def _load_points(query) -> PointSet:
+    rows = query.all()
+    return PointSet([row.id for row in rows], [row.latitude for row in rows], [row.longitude for row in rows])
+
+
+def _bump_versions(db: Session, turf_ids: Iterable[int]):
+    turf_ids = list(turf_ids)
+    if turf_ids:
+        db.query(Turf).filter(Turf.id.in_(turf_ids)).update(
+            {Turf.membership_version: Turf.membership_version + 1},
+            synchronize_session=False
+        )
+
+
+def _member_turf_ids(db: Session, voter_ids: List[int]) -> set:
+    return {row.turf_id for row in db.query(TurfVoter.turf_id).filter(TurfVoter.voter_id.in_(voter_ids)).distinct()}
+
+
+def rebuild_turf_membership(db: Session, turf: Turf) -> int:
+    """Recompute turf_voters for one turf from its boundary. The caller commits."""
+    db.query(TurfVoter).filter(TurfVoter.turf_id == turf.id).delete(synchronize_session=False)
+    try:
+        polygon = parse_boundary(turf.boundary)
+    except ValueError:
+        polygon = []
+    bbox = turf_bbox(turf)
+    voter_ids = []
+    if polygon and bbox:
+        candidates = filter_bbox(db.query(Voter.id, Voter.latitude, Voter.longitude), Voter.latitude, Voter.longitude, bbox)
+        points = _load_points(candidates)
+        voter_ids = points.ids[points.within(polygon, bbox)].tolist()
+        insert_memberships(db, [{"turf_id": turf.id, "voter_id": voter_id} for voter_id in voter_ids])
+    turf.membership_updated_at = datetime.datetime.utcnow()
+    turf.membership_version = (turf.membership_version or 0) + 1
+    return len(voter_ids)
+
+
+def rebuild_all_turf_memberships(db: Session) -> Tuple[Dict[int, int], int, int]:
+    """
+    Recompute turf_voters for every turf in one pass: all geocoded voters are
+    loaded once and tested against each boundary. Returns the member count per
+    turf id and how many voters fall in at least one turf and in none. The
+    caller commits.
+    """
+    points = _load_points(db.query(Voter.id, Voter.latitude, Voter.longitude).filter(
+        Voter.latitude.isnot(None),
+        Voter.longitude.isnot(None)
+    ))
+    db.query(TurfVoter).delete(synchronize_session=False)
+    covered = np.zeros(len(points), dtype=bool)
+    counts = {}
+    now = datetime.datetime.utcnow()
+    for turf in db.query(Turf).order_by(Turf.id):
+        try:
+            polygon = parse_boundary(turf.boundary)
+        except ValueError:
+            polygon = []
+        positions = points.within(polygon, turf_bbox(turf)) if polygon and len(points) else np.empty(0, dtype=np.intp)
+        covered[positions] = True
+        insert_memberships(db, [{"turf_id": turf.id, "voter_id": voter_id} for voter_id in points.ids[positions].tolist()])
+        counts[turf.id] = len(positions)
+        turf.membership_updated_at = now
+        turf.membership_version = (turf.membership_version or 0) + 1
+    assigned = int(covered.sum())
+    return counts, assigned, len(points) - assigned
+
+
+def refresh_voter_memberships(db: Session, voter_ids: Iterable[int]) -> int:
+    """
+    Recompute turf_voters for a set of voters, e.g. after their coordinates
+    changed. Only turfs whose bbox overlaps the voters' envelope are tested.
+    The caller commits.
+    """
+    voter_ids = list(voter_ids)
+    if not voter_ids:
+        return 0
+    changed_turfs = _member_turf_ids(db, voter_ids)
+    db.query(TurfVoter).filter(TurfVoter.voter_id.in_(voter_ids)).delete(synchronize_session=False)
+    points = _load_points(db.query(Voter.id, Voter.latitude, Voter.longitude).filter(
+        Voter.id.in_(voter_ids),
+        Voter.latitude.isnot(None),
+        Voter.longitude.isnot(None)
+    ))
+    if not len(points):
+        _bump_versions(db, changed_turfs)
+        return 0
+
+    turfs = db.query(Turf).filter(
+        Turf.min_lat <= float(points.lats.max()),
+        Turf.max_lat >= float(points.lats.min()),
+        Turf.min_lng <= float(points.lngs.max()),
+        Turf.max_lng >= float(points.lngs.min())
+    ).all()
+    pairs = []
+    for turf in turfs:
+        try:
+            polygon = parse_boundary(turf.boundary)
+        except ValueError:
+            continue
+        for voter_id in points.ids[points.within(polygon, turf_bbox(turf))].tolist():
+            pairs.append({"turf_id": turf.id, "voter_id": voter_id})
+    insert_memberships(db, pairs)
+    # Versions key cached walk lists; bump turfs that lost or gained any of these voters
+    _bump_versions(db, changed_turfs | {pair["turf_id"] for pair in pairs})
+    return len(pairs)
+
+
+def remove_voter_memberships(db: Session, voter_ids: Iterable[int]):
+    voter_ids = list(voter_ids)
+    changed_turfs = _member_turf_ids(db, voter_ids)
+    db.query(TurfVoter).filter(TurfVoter.voter_id.in_(voter_ids)).delete(synchronize_session=False)
+    _bump_versions(db, changed_turfs)
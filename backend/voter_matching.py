@@ -0,0 +1,62 @@
+# backend/voter_matching.py
+import hashlib
+from typing import List, Optional
+
+import pandas as pd
+
+from addresses import ABBREVIATIONS, NON_ALNUM, normalize_address
+
+
+def _normalize(value: Optional[str]) -> str:
+    return " ".join(NON_ALNUM.sub(" ", (value or "").lower()).split())
+
+
+def voter_match_key(first_name: Optional[str], last_name: Optional[str], address: Optional[str], external_id: Optional[str] = None) -> str:
+    """
+    Hashed identity used to recognize a voter on re-import. The external voter
+    id wins when there is one; otherwise case-, punctuation- and
+    abbreviation-insensitive name and address. Hashing keeps the indexed
+    column short whatever the address length.
+    """
+    external_id = _normalize(external_id)
+    if external_id:
+        identity = f"id:{external_id}"
+    else:
+        identity = f"nm:{_normalize(first_name)}|{_normalize(last_name)}|{normalize_address(address)}"
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+def _normalize_series(values: pd.Series) -> pd.Series:
+    return values.str.lower().str.replace(NON_ALNUM.pattern, " ", regex=True).str.strip()
+
+
+def _normalize_addresses(addresses: pd.Series) -> pd.Series:
+    """
+    normalize_address over an Arrow-backed column: the tokens of all rows are
+    dictionary-encoded, so each distinct token is looked up once, and the
+    rows are rebuilt from the mapped tokens.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    values = pa.array(_normalize_series(addresses), type=pa.string())
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    tokens = pc.split_pattern(values, " ")
+    encoded = pc.list_flatten(tokens).dictionary_encode()
+    abbreviated = pa.array([ABBREVIATIONS.get(token, token) for token in encoded.dictionary.to_pylist()], pa.string())
+    rebuilt = pa.ListArray.from_arrays(tokens.offsets, abbreviated.take(encoded.indices))
+    return pd.Series(pc.binary_join(rebuilt, " "), index=addresses.index, dtype=pd.ArrowDtype(pa.string()))
+
+
+def voter_match_keys(first_names: pd.Series, last_names: pd.Series, addresses: pd.Series, external_ids: pd.Series) -> List[str]:
+    """
+    voter_match_key over whole Arrow-backed string columns ("" for a missing
+    external id); only the hashing runs per row. Needs pyarrow.
+    """
+    external_ids = _normalize_series(external_ids)
+    identities = ("id:" + external_ids).where(
+        external_ids != "",
+        "nm:" + _normalize_series(first_names) + "|" + _normalize_series(last_names) + "|" + _normalize_addresses(addresses).astype(external_ids.dtype)
+    )
+    return [hashlib.sha1(identity.encode("utf-8")).hexdigest() for identity in identities.tolist()]
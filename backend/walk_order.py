@@ -0,0 +1,177 @@
+# backend/walk_order.py
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from addresses import normalize_address
+from models import Turf, TurfVoter, Voter
+
+EARTH_RADIUS_KM = 6371.0
+# 2-opt is O(n^2) per pass; larger walk lists keep the nearest-neighbour route
+TWO_OPT_MAX_STOPS = 1500
+TWO_OPT_MAX_PASSES = 8
+WALK_LIST_CACHE_SIZE = 1024
+
+
+def _project(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Equirectangular projection to kilometres; accurate enough at turf scale."""
+    lat0 = math.radians(float(lats.mean())) if lats.size else 0.0
+    x = np.radians(lngs) * math.cos(lat0) * EARTH_RADIUS_KM
+    y = np.radians(lats) * EARTH_RADIUS_KM
+    return np.column_stack([x, y])
+
+
+def _nearest_neighbour(points: np.ndarray) -> np.ndarray:
+    n = len(points)
+    # Start from the westernmost stop so routes sweep across the turf rather than starting mid-way
+    current = int(np.argmin(points[:, 0]))
+    visited = np.zeros(n, dtype=bool)
+    route = np.empty(n, dtype=np.intp)
+    for step in range(n):
+        route[step] = current
+        visited[current] = True
+        if step == n - 1:
+            break
+        distances = np.hypot(points[:, 0] - points[current, 0], points[:, 1] - points[current, 1])
+        distances[visited] = np.inf
+        current = int(np.argmin(distances))
+    return route
+
+
+def _two_opt(points: np.ndarray, route: np.ndarray, max_passes: int = TWO_OPT_MAX_PASSES) -> np.ndarray:
+    """Improve an open route by reversing segments while that shortens it."""
+    n = len(route)
+    if n < 4:
+        return route
+    route = route.copy()
+    for _ in range(max_passes):
+        improved = False
+        for i in range(n - 2):
+            a, b = points[route[i]], points[route[i + 1]]
+            c = points[route[i + 2:]]  # candidate segment ends j = i+2 .. n-1
+            d = np.vstack([points[route[i + 3:]], c[-1:]])  # the stop after each j (the route end pairs with itself)
+            ab = math.hypot(b[0] - a[0], b[1] - a[1])
+            ac = np.hypot(c[:, 0] - a[0], c[:, 1] - a[1])
+            bd = np.hypot(d[:, 0] - b[0], d[:, 1] - b[1])
+            cd = np.hypot(d[:, 0] - c[:, 0], d[:, 1] - c[:, 1])
+            # The last j has no following edge, so reversing up to it only swaps a-b for a-c
+            bd[-1] = 0.0
+            delta = ac + bd - ab - cd
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                j = i + 2 + best
+                route[i + 1:j + 1] = route[i + 1:j + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return route
+
+
+def order_stops(lats: Sequence[float], lngs: Sequence[float]) -> Tuple[np.ndarray, float]:
+    """Visiting order for a set of stops and the walking distance (km) along it."""
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    if lats.size == 0:
+        return np.empty(0, dtype=np.intp), 0.0
+    points = _project(lats, lngs)
+    route = _nearest_neighbour(points)
+    if len(route) <= TWO_OPT_MAX_STOPS:
+        route = _two_opt(points, route)
+    legs = np.diff(points[route], axis=0)
+    return route, float(np.hypot(legs[:, 0], legs[:, 1]).sum())
+
+
+def build_walk_list(voters: Sequence) -> dict:
+    """
+    Group voters into one stop per address and sequence the stops. `voters` are
+    rows with id, first_name, last_name, address, latitude and longitude.
+    """
+    stops: Dict[str, dict] = {}
+    for voter in voters:
+        if voter.latitude is None or voter.longitude is None:
+            continue
+        key = normalize_address(voter.address) if voter.address else f"voter:{voter.id}"
+        stop = stops.get(key)
+        if stop is None:
+            stop = stops[key] = {"address": voter.address, "lat": voter.latitude, "lng": voter.longitude, "voters": []}
+        stop["voters"].append({"id": voter.id, "first_name": voter.first_name, "last_name": voter.last_name})
+
+    stop_list = list(stops.values())
+    route, distance_km = order_stops([stop["lat"] for stop in stop_list], [stop["lng"] for stop in stop_list])
+    ordered = []
+    for sequence, index in enumerate(route.tolist(), start=1):
+        stop = stop_list[index]
+        ordered.append({"sequence": sequence, **stop})
+    return {
+        "stop_count": len(ordered),
+        "voter_count": sum(len(stop["voters"]) for stop in ordered),
+        "distance_km": round(distance_km, 3),
+        "stops": ordered,
+    }
+
+
+class WalkListCache:
+    """Walk lists keyed by turf and membership version; a version bump makes the old entry a miss."""
+
+    def __init__(self, max_size: int = WALK_LIST_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[int, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, turf_id: int, version: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(turf_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(turf_id)
+            return entry[1]
+
+    def put(self, turf_id: int, version: int, walk_list: dict):
+        with self._lock:
+            self._entries[turf_id] = (version, walk_list)
+            self._entries.move_to_end(turf_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, turf_id: int):
+        with self._lock:
+            self._entries.pop(turf_id, None)
+
+
+walk_list_cache = WalkListCache()
+
+_VOTER_COLUMNS = (Voter.id, Voter.first_name, Voter.last_name, Voter.address, Voter.latitude, Voter.longitude)
+
+
+def get_walk_list(db: Session, turf: Turf) -> dict:
+    version = turf.membership_version or 0
+    walk_list = walk_list_cache.get(turf.id, version)
+    if walk_list is None:
+        voters = db.query(*_VOTER_COLUMNS).join(TurfVoter, TurfVoter.voter_id == Voter.id).filter(
+            TurfVoter.turf_id == turf.id
+        ).order_by(Voter.id).all()
+        walk_list = {"turf_id": turf.id, "membership_version": version, **build_walk_list(voters)}
+        walk_list_cache.put(turf.id, version, walk_list)
+    return walk_list
+
+
+def build_walk_lists(db: Session, turfs: List[Turf]) -> List[dict]:
+    """Batch variant for many turfs: members are loaded with one query and only stale entries are rebuilt."""
+    walk_lists = {turf.id: walk_list_cache.get(turf.id, turf.membership_version or 0) for turf in turfs}
+    members: Dict[int, list] = {turf_id: [] for turf_id, walk_list in walk_lists.items() if walk_list is None}
+    if members:
+        rows = db.query(TurfVoter.turf_id, *_VOTER_COLUMNS).join(Voter, Voter.id == TurfVoter.voter_id).filter(
+            TurfVoter.turf_id.in_(list(members))
+        ).order_by(TurfVoter.turf_id, Voter.id).all()
+        for row in rows:
+            members[row.turf_id].append(row)
+    for turf in turfs:
+        if walk_lists[turf.id] is None:
+            version = turf.membership_version or 0
+            walk_lists[turf.id] = {"turf_id": turf.id, "membership_version": version, **build_walk_list(members[turf.id])}
+            walk_list_cache.put(turf.id, version, walk_lists[turf.id])
+    return [walk_lists[turf.id] for turf in turfs]
@@ -224,8 +224,12 @@ function CSVImportMappingModal({ onClose, onImportSuccess }) {
       formData.append('update_existing', importOptions.updateExisting.toString());
       formData.append('match_threshold', importOptions.importMatchThreshold.toString());
 
+      const token = localStorage.getItem('token');
       const response = await fetch('http://localhost:8000/import/voters', {
         method: 'POST',
+        headers: {
+          Authorization: `Bearer ${token}`
+        },
         body: formData,
       });
 
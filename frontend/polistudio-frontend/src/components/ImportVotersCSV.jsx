@@ -37,8 +37,12 @@ Jane,Smith,456 Elm St,4,555-0124,jane@example.com`;
     setUploading(true);
 
     try {
+      const token = localStorage.getItem('token');
       const response = await fetch('http://127.0.0.1:8000/import/voters', {
         method: 'POST',
+        headers: {
+          Authorization: `Bearer ${token}`
+        },
         body: formData
       });
       